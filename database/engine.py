@@ -0,0 +1,176 @@
+import os
+import logging
+import threading
+import configparser
+from sqlalchemy import create_engine, event, inspect, text, func
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool, StaticPool
+from sqlalchemy.sql import insert, select, update
+from database.models import Base, Schedule, ScheduleRun, ActiveRun, TimeSlot, PERIODS, TIME_SLOTS
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Файл налаштувань за замовчуванням; інший шлях можна задати змінною SCHEDULE_DB_CONFIG
+CONFIG_FILE = os.path.join(PROJECT_DIR, "database.ini")
+# Розділ файлу налаштувань і префікс змінних оточення (SCHEDULE_DB_URL, SCHEDULE_DB_ROLE, ...)
+CONFIG_SECTION = "database"
+ENV_PREFIX = "SCHEDULE_DB_"
+
+DEFAULTS = {
+    "url": "sqlite:///" + os.path.join(PROJECT_DIR, "schedule.db"),
+    # Тип процесу: desktop — застосунок, що пише розклад; web — багатопотоковий читач
+    "role": "desktop",
+    "pool_size": "",
+    # Прагми SQLite: розмір відображення файлу в пам'ять (байт) і кеш сторінок (від'ємне — у КіБ)
+    "mmap_size": str(256 * 1024 * 1024),
+    "cache_size": str(-64 * 1024),
+    # Скільки мілісекунд чекати на блокування запису, перш ніж повернути помилку
+    "busy_timeout": "5000",
+}
+
+# Розмір пулу з'єднань за типом процесу: десктоп — головний потік і фоновий збирач старих запусків,
+# веб — потоки, що одночасно обслуговують запити
+POOL_SIZES = {"desktop": 2, "web": 8}
+
+# Розклад з рядком часу для читачів, яким потрібен текстовий вигляд
+SCHEDULE_VIEW = """
+CREATE VIEW IF NOT EXISTS schedule_view AS
+SELECT schedule.*, time_slots.day, time_slots.period, time_slots.label AS time_slot
+FROM schedule JOIN time_slots ON time_slots.id = schedule.slot_index
+"""
+
+_engine = None
+_overrides = {}
+_lock = threading.Lock()
+
+def load_config(path=None):
+    """Налаштування бази: значення за замовчуванням, потім файл налаштувань, потім змінні оточення."""
+    config = dict(DEFAULTS)
+    path = path or os.environ.get(ENV_PREFIX + "CONFIG", CONFIG_FILE)
+    parser = configparser.ConfigParser()
+    if parser.read(path, encoding="utf-8") and parser.has_section(CONFIG_SECTION):
+        config.update(parser.items(CONFIG_SECTION))
+    for key in DEFAULTS:
+        value = os.environ.get(ENV_PREFIX + key.upper())
+        if value is not None:
+            config[key] = value
+    return config
+
+def create_configured_engine(config):
+    """Створює рушій за налаштуваннями: пул за типом процесу і прагми SQLite на кожному з'єднанні."""
+    url = make_url(config["url"])
+    role = config["role"]
+    if role not in POOL_SIZES:
+        raise ValueError(f"Невідомий тип процесу: {role}")
+    if url.get_backend_name() != "sqlite":
+        return create_engine(url, pool_size=int(config["pool_size"] or POOL_SIZES[role]))
+
+    if url.database in (None, "", ":memory:"):
+        # База в пам'яті існує, поки відкрите з'єднання, тож усі потоки ділять одне
+        engine = create_engine(url, poolclass=StaticPool, connect_args={"check_same_thread": False})
+    else:
+        engine = create_engine(
+            url,
+            poolclass=QueuePool,
+            pool_size=int(config["pool_size"] or POOL_SIZES[role]),
+            connect_args={"check_same_thread": False, "timeout": int(config["busy_timeout"]) / 1000},
+        )
+
+    pragmas = [
+        # WAL: читачі не блокують запис і бачать останній зафіксований стан, поки запуск зберігається
+        "journal_mode=WAL",
+        # У режимі WAL синхронізація на кожному коміті зайва: цілісність зберігається, ризикує лише останній коміт
+        "synchronous=NORMAL",
+        f"mmap_size={int(config['mmap_size'])}",
+        f"cache_size={int(config['cache_size'])}",
+        f"busy_timeout={int(config['busy_timeout'])}",
+    ]
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(f"PRAGMA {pragma}")
+        finally:
+            cursor.close()
+
+    return engine
+
+def configure(**settings):
+    """Змінює налаштування поточного процесу (url, role, ...); рушій буде створено заново при наступному зверненні.
+
+    Викликається до першої роботи з базою, наприклад configure(role="web") у вебзастосунку.
+    """
+    global _engine
+    unknown = set(settings) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Невідомі налаштування бази: {', '.join(sorted(unknown))}")
+    with _lock:
+        _overrides.update({key: str(value) for key, value in settings.items()})
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+
+def get_engine():
+    """Рушій процесу; при першому зверненні створюється за налаштуваннями і доводить схему бази до моделей."""
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                config = load_config() | _overrides
+                engine = create_configured_engine(config)
+                init_schema(engine)
+                logger.info(f"Підключено базу даних: {engine.url.render_as_string(hide_password=True)}")
+                _engine = engine
+    return _engine
+
+def init_schema(engine):
+    """Створює відсутні таблиці й виконує міграції наявної бази."""
+    Base.metadata.create_all(engine)
+    _migrate(engine)
+
+def _migrate(engine):
+    """Доводить схему наявної бази до моделей: create_all не додає стовпці в уже створені таблиці."""
+    with engine.begin() as connection:
+        if not connection.execute(select(func.count()).select_from(TimeSlot)).scalar():
+            connection.execute(insert(TimeSlot), [
+                {"id": index, "day": index // len(PERIODS), "period": index % len(PERIODS), "label": label}
+                for index, label in enumerate(TIME_SLOTS)
+            ])
+
+    columns = {column["name"] for column in inspect(engine).get_columns("schedule")}
+    if "run_id" not in columns:
+        with engine.begin() as connection:
+            connection.execute(text("ALTER TABLE schedule ADD COLUMN run_id INTEGER REFERENCES schedule_run(id)"))
+            # Уже збережений розклад стає першим, опублікованим запуском
+            if connection.execute(select(func.count()).select_from(Schedule)).scalar():
+                run_id = connection.execute(
+                    insert(ScheduleRun).values(algorithm="import", params="{}")
+                ).inserted_primary_key[0]
+                connection.execute(update(Schedule).values(run_id=run_id))
+                connection.execute(insert(ActiveRun).values(id=1, run_id=run_id))
+        logger.info("Схему бази оновлено: розклад прив'язано до запусків")
+    if "slot_index" not in columns:
+        _rebuild_schedule(engine)
+
+    with engine.begin() as connection:
+        connection.execute(text(SCHEDULE_VIEW))
+
+def _rebuild_schedule(engine):
+    """Перебудовує таблицю розкладу: рядок часу замінюється номером слота, додаються індекси."""
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE schedule RENAME TO schedule_old"))
+        Schedule.__table__.create(connection)
+        copied = connection.execute(text(
+            "INSERT INTO schedule (id, run_id, group_id, subgroup_id, teacher_id, classroom_id, discipline_id, "
+            "lesson_type, slot_index) "
+            "SELECT s.id, s.run_id, s.group_id, s.subgroup_id, s.teacher_id, s.classroom_id, s.discipline_id, "
+            "s.lesson_type, t.id FROM schedule_old s JOIN time_slots t ON t.label = s.time_slot"
+        )).rowcount
+        total = connection.execute(text("SELECT count(*) FROM schedule_old")).scalar()
+        connection.execute(text("DROP TABLE schedule_old"))
+    if copied < total:
+        logger.warning(f"Пропущено записів розкладу з невідомим часом: {total - copied}")
+    logger.info("Схему бази оновлено: час заняття зберігається номером слота")
@@ -1,5 +1,6 @@
 from enum import Enum
-from sqlalchemy import Column, Integer, String, ForeignKey, Table
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Table, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql.sqltypes import Enum as SQLEnum
 from sqlalchemy.orm import relationship
@@ -14,6 +15,11 @@ class ClassroomType(str, Enum):
     LECTURE = "LECTURE"
     LAB = "LAB"
 
+DAYS = ("Понеділок", "Вівторок", "Середа", "Четвер", "П'ятниця")
+PERIODS = ("8:30-10:00", "10:00-11:30", "12:00-13:30", "13:30-15:00")
+TIME_SLOTS = tuple(f"{day} {period}" for day in DAYS for period in PERIODS)
+SLOT_INDEX = {time_slot: index for index, time_slot in enumerate(TIME_SLOTS)}
+
 teacher_disciplines = Table(
     "teacher_disciplines",
     Base.metadata,
@@ -55,13 +61,55 @@ class Discipline(Base):
     name = Column(String, nullable=False)
     teachers = relationship("Teacher", secondary=teacher_disciplines, back_populates="disciplines")
 
+class ScheduleRun(Base):
+    __tablename__ = "schedule_run"
+    id = Column(Integer, primary_key=True)
+    algorithm = Column(String, nullable=False)
+    params = Column(String)  # JSON string
+    fitness = Column(Float)
+    duration = Column(Float)  # Секунд
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+class ActiveRun(Base):
+    """Вказівник на опублікований запуск: єдиний рядок з id = 1."""
+    __tablename__ = "active_run"
+    id = Column(Integer, primary_key=True)
+    run_id = Column(Integer, ForeignKey("schedule_run.id"), nullable=True)
+
+class TimeSlot(Base):
+    """Часовий слот: id — номер слота (день × кількість пар + пара)."""
+    __tablename__ = "time_slots"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    day = Column(Integer, nullable=False)
+    period = Column(Integer, nullable=False)
+    label = Column(String, nullable=False, unique=True)
+
 class Schedule(Base):
     __tablename__ = "schedule"
     id = Column(Integer, primary_key=True)
+    run_id = Column(Integer, ForeignKey("schedule_run.id"), nullable=True)
     group_id = Column(Integer, ForeignKey("groups.id"), nullable=True)
     subgroup_id = Column(Integer, ForeignKey("subgroups.id"), nullable=True)
     teacher_id = Column(Integer, ForeignKey("teachers.id"), nullable=False)
     classroom_id = Column(Integer, ForeignKey("classrooms.id"), nullable=False)
     discipline_id = Column(Integer, ForeignKey("disciplines.id"), nullable=False)
     lesson_type = Column(SQLEnum(LessonType), nullable=False)
-    time_slot = Column(String, nullable=False)
\ No newline at end of file
+    slot_index = Column(Integer, ForeignKey("time_slots.id"), nullable=False)
+
+    # Викладач чи аудиторія першими: індекс обслуговує і пошук за сутністю, і перевірку накладки в слоті
+    __table_args__ = (
+        Index("ix_schedule_teacher_slot", "teacher_id", "slot_index"),
+        Index("ix_schedule_classroom_slot", "classroom_id", "slot_index"),
+        Index("ix_schedule_group", "group_id"),
+        Index("ix_schedule_subgroup", "subgroup_id"),
+        Index("ix_schedule_run", "run_id"),
+    )
+
+    @property
+    def time_slot(self):
+        """Рядок «День пара», похідний від slot_index."""
+        return TIME_SLOTS[self.slot_index]
+
+    @time_slot.setter
+    def time_slot(self, value):
+        self.slot_index = SLOT_INDEX[value]
\ No newline at end of file
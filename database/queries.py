@@ -1,15 +1,35 @@
 from sqlalchemy.orm import sessionmaker
-from database.models import Teacher, Classroom, Group, Subgroup, Discipline, Schedule, Base, teacher_disciplines, LessonType, ClassroomType
-from sqlalchemy import create_engine
-from sqlalchemy.sql import insert, delete
+from database.models import (
+    Teacher, Classroom, Group, Subgroup, Discipline, Schedule, ScheduleRun, ActiveRun, teacher_disciplines,
+    LessonType, ClassroomType, SLOT_INDEX
+)
+from database.engine import get_engine
+from sqlalchemy.sql import insert, delete, select
 from sqlalchemy.exc import IntegrityError
+from collections import defaultdict
+import numpy as np
+import json
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
-engine = create_engine("sqlite:///C:/Users/user/PycharmProjects/DiplomWork/schedule.db")
-Base.metadata.create_all(engine)
-Session = sessionmaker(bind=engine)
+_sessionmaker = sessionmaker()
+
+def Session():
+    """Нова сесія бази; рушій і схема створюються при першому зверненні (див. database.engine)."""
+    return _sessionmaker(bind=get_engine())
+
+# Скільки найновіших запусків зберігається для відкату (активний — завжди); старші видаляються у фоні
+KEEP_RUNS = 3
+# Рядки старих запусків видаляються порціями, щоб не блокувати читачів однією великою транзакцією
+GC_BATCH = 5000
+
+# Кеш зв'язків викладачів і дисциплін у процесі; скидається функціями, що змінюють teacher_disciplines
+_links_index = None
+_links_lock = threading.Lock()
+_NO_IDS = np.array([], dtype=np.int64)
+_NO_IDS.setflags(write=False)
 
 def add_teacher(name, availability, max_load=10):
     session = Session()
@@ -27,6 +47,7 @@ def add_teacher_discipline(teacher_id, discipline_id):
         stmt = insert(teacher_disciplines).values(teacher_id=teacher_id, discipline_id=discipline_id)
         session.execute(stmt)
         session.commit()
+        _invalidate_teacher_discipline_index()
     finally:
         session.close()
 
@@ -70,10 +91,11 @@ def add_discipline(name):
     finally:
         session.close()
 
-def add_schedule(group_id=None, subgroup_id=None, teacher_id=None, classroom_id=None, discipline_id=None, lesson_type=None, time_slot=None):
+def add_schedule(group_id=None, subgroup_id=None, teacher_id=None, classroom_id=None, discipline_id=None, lesson_type=None, time_slot=None, run_id=None):
     session = Session()
     try:
         schedule = Schedule(
+            run_id=run_id,
             group_id=group_id,
             subgroup_id=subgroup_id,
             teacher_id=teacher_id,
@@ -88,6 +110,118 @@ def add_schedule(group_id=None, subgroup_id=None, teacher_id=None, classroom_id=
     finally:
         session.close()
 
+# Стовпці розкладу, що беруться зі словника заняття (час — окремо, як номер слота)
+SCHEDULE_COLUMNS = ("group_id", "subgroup_id", "teacher_id", "classroom_id", "discipline_id", "lesson_type")
+
+def save_schedule(lessons, run_id=None, replace=False):
+    """Зберігає заняття розкладу запуску run_id одним executemany в одній транзакції і повертає їхні id.
+
+    Якщо replace=True, попередні рядки того самого запуску видаляються в тій самій транзакції,
+    тож у базі завжди або старий, або новий розклад повністю.
+    """
+    rows = [
+        {column: lesson.get(column) for column in SCHEDULE_COLUMNS}
+        | {"run_id": run_id, "slot_index": SLOT_INDEX[lesson["time_slot"]]}
+        for lesson in lessons
+    ]
+    session = Session()
+    try:
+        if replace:
+            same_run = Schedule.run_id.is_(None) if run_id is None else Schedule.run_id == run_id
+            session.execute(delete(Schedule).where(same_run))
+        ids = []
+        if rows:
+            result = session.execute(insert(Schedule).returning(Schedule.id, sort_by_parameter_order=True), rows)
+            ids = result.scalars().all()
+        session.commit()
+        return ids
+    finally:
+        session.close()
+
+def create_run(algorithm, params=None, fitness=None, duration=None):
+    """Реєструє запуск оптимізації (ще не опублікований) і повертає його id."""
+    session = Session()
+    try:
+        run = ScheduleRun(
+            algorithm=algorithm,
+            params=json.dumps(params or {}, ensure_ascii=False, default=str),
+            fitness=float(fitness) if fitness is not None else None,
+            duration=duration
+        )
+        session.add(run)
+        session.commit()
+        return run.id
+    finally:
+        session.close()
+
+def activate_run(run_id, collect=True):
+    """Публікує запуск одним оновленням вказівника; якщо collect, старі запуски видаляються у фоновому потоці."""
+    session = Session()
+    try:
+        session.merge(ActiveRun(id=1, run_id=run_id))
+        session.commit()
+    finally:
+        session.close()
+    if collect:
+        threading.Thread(target=collect_old_runs, daemon=True).start()
+
+def publish_schedule(lessons, algorithm, params=None, fitness=None, duration=None):
+    """Зберігає розклад як новий запуск і робить його активним; повертає id запуску.
+
+    Поки рядки записуються, читачі бачать попередній запуск; перемикання — одне оновлення вказівника.
+    """
+    run_id = create_run(algorithm, params, fitness, duration)
+    save_schedule(lessons, run_id=run_id)
+    activate_run(run_id)
+    return run_id
+
+def get_active_run_id():
+    session = Session()
+    try:
+        return session.scalar(select(ActiveRun.run_id).where(ActiveRun.id == 1))
+    finally:
+        session.close()
+
+def get_runs():
+    session = Session()
+    try:
+        return session.query(ScheduleRun).order_by(ScheduleRun.id.desc()).all()
+    finally:
+        session.close()
+
+def collect_old_runs(keep=KEEP_RUNS):
+    """Видаляє запуски, окрім активного і keep найновіших, разом з їхнім розкладом."""
+    session = Session()
+    try:
+        active = session.scalar(select(ActiveRun.run_id).where(ActiveRun.id == 1))
+        runs = session.scalars(select(ScheduleRun.id).order_by(ScheduleRun.id.desc())).all()
+        stale = [run_id for run_id in runs[keep:] if run_id != active]
+        for run_id in stale:
+            batch = select(Schedule.id).where(Schedule.run_id == run_id).limit(GC_BATCH)
+            while session.execute(delete(Schedule).where(Schedule.id.in_(batch))).rowcount:
+                session.commit()
+            session.execute(delete(ScheduleRun).where(ScheduleRun.id == run_id))
+            session.commit()
+        if stale:
+            logger.info(f"Видалено старих запусків: {len(stale)}")
+        return len(stale)
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Помилка видалення старих запусків: {e}")
+        return 0
+    finally:
+        session.close()
+
+def _active_run():
+    return select(ActiveRun.run_id).where(ActiveRun.id == 1).scalar_subquery()
+
+def get_active_schedule():
+    session = Session()
+    try:
+        return session.query(Schedule).filter(Schedule.run_id == _active_run()).all()
+    finally:
+        session.close()
+
 def update_schedule(schedule_id, group_id=None, subgroup_id=None, teacher_id=None, classroom_id=None, discipline_id=None, lesson_type=None, time_slot=None):
     session = Session()
     try:
@@ -114,14 +248,14 @@ def update_schedule(schedule_id, group_id=None, subgroup_id=None, teacher_id=Non
 def get_schedule_by_group(group_id):
     session = Session()
     try:
-        return session.query(Schedule).filter_by(group_id=group_id).all()
+        return session.query(Schedule).filter(Schedule.run_id == _active_run()).filter_by(group_id=group_id).all()
     finally:
         session.close()
 
 def get_schedule_by_subgroup(subgroup_id):
     session = Session()
     try:
-        return session.query(Schedule).filter_by(subgroup_id=subgroup_id).all()
+        return session.query(Schedule).filter(Schedule.run_id == _active_run()).filter_by(subgroup_id=subgroup_id).all()
     finally:
         session.close()
 
@@ -161,14 +295,53 @@ def get_discipline_by_id(discipline_id):
         session.close()
 
 def get_teachers_for_discipline(discipline_id):
+    """Id викладачів дисципліни (відсортований масив) з кешованого індексу зв'язків."""
+    return _teacher_discipline_index()[0].get(discipline_id, _NO_IDS)
+
+def get_disciplines_for_teacher(teacher_id):
+    """Id дисциплін викладача (відсортований масив) з кешованого індексу зв'язків."""
+    return _teacher_discipline_index()[1].get(teacher_id, _NO_IDS)
+
+def _teacher_discipline_index():
+    """Індекс зв'язків (дисципліна → викладачі, викладач → дисципліни); будується одним запитом при першому зверненні."""
+    global _links_index
+    index = _links_index
+    if index is None:
+        with _links_lock:
+            if _links_index is None:
+                _links_index = _build_teacher_discipline_index()
+            index = _links_index
+    return index
+
+def _build_teacher_discipline_index():
     session = Session()
     try:
-        discipline = session.query(Discipline).filter_by(id=discipline_id).first()
-        if discipline:
-            return [teacher.id for teacher in discipline.teachers]
-        return []
+        links = session.execute(
+            select(teacher_disciplines.c.discipline_id, teacher_disciplines.c.teacher_id)
+            .join(Teacher, Teacher.id == teacher_disciplines.c.teacher_id)
+            .join(Discipline, Discipline.id == teacher_disciplines.c.discipline_id)
+        ).all()
     finally:
         session.close()
+    teachers, disciplines = defaultdict(set), defaultdict(set)
+    for discipline_id, teacher_id in links:
+        teachers[discipline_id].add(teacher_id)
+        disciplines[teacher_id].add(discipline_id)
+    return (
+        {discipline_id: _id_array(ids) for discipline_id, ids in teachers.items()},
+        {teacher_id: _id_array(ids) for teacher_id, ids in disciplines.items()},
+    )
+
+def _invalidate_teacher_discipline_index():
+    """Скидає індекс після зміни зв'язків; наступне звернення перебудує його."""
+    global _links_index
+    with _links_lock:
+        _links_index = None
+
+def _id_array(ids):
+    array = np.array(sorted(ids), dtype=np.int64)
+    array.setflags(write=False)
+    return array
 
 def get_all_teachers():
     session = Session()
@@ -229,6 +402,7 @@ def delete_teacher(teacher_id):
         if teacher:
             session.delete(teacher)
             session.commit()
+            _invalidate_teacher_discipline_index()
         else:
             raise ValueError("Викладач не знайдений")
     except IntegrityError:
@@ -310,6 +484,7 @@ def delete_discipline(discipline_id):
         if discipline:
             session.delete(discipline)
             session.commit()
+            _invalidate_teacher_discipline_index()
         else:
             raise ValueError("Дисципліна не знайдена")
     except IntegrityError:
@@ -329,8 +504,10 @@ def delete_schedule(schedule_id=None):
             else:
                 raise ValueError("Запис розкладу не знайдено")
         else:
-            # Видалити весь розклад
+            # Видалити весь розклад разом з усіма запусками
             session.query(Schedule).delete()
+            session.query(ActiveRun).delete()
+            session.query(ScheduleRun).delete()
             session.commit()
     except IntegrityError:
         session.rollback()
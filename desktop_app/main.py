@@ -8,6 +8,9 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtCore import Qt
 from optimization.algorithms.genetic import run_genetic_algorithm
 from optimization.algorithms.simulated_annealing import run_simulated_annealing, evaluate_schedule
+from optimization.algorithms.tabu import run_tabu_search
+from optimization.algorithms.constraint_solver import run_constraint_solver
+from optimization.algorithms.lns import run_lns
 from optimization.algorithms.greedy import run_greedy_algorithm
 from optimization.algorithms.random_search import run_random_search
 from database.queries import (
@@ -20,6 +23,9 @@ from database.queries import (
 )
 from database.models import LessonType
 
+# Бюджет часу (секунд) алгоритмів з обмеженням за часом: оптимізація йде в потоці інтерфейсу і вікно не відповідає
+UI_TIME_BUDGET = 5
+
 class InputDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -175,7 +181,7 @@ class ScheduleApp(QMainWindow):
         # Вибір алгоритму
         algorithm_label = QLabel("Алгоритм:")
         self.algorithm_choice = QComboBox()
-        self.algorithm_choice.addItems(["Генетичний алгоритм", "Імітація відпалу", "Жадібний алгоритм", "Випадковий пошук"])
+        self.algorithm_choice.addItems(["Генетичний алгоритм", "Імітація відпалу", "Табу-пошук", "Пошук великих околів", "Точний розв'язувач", "Жадібний алгоритм", "Випадковий пошук"])
         button_layout.addWidget(algorithm_label)
         button_layout.addWidget(self.algorithm_choice)
         button_layout.addStretch()
@@ -261,6 +267,12 @@ class ScheduleApp(QMainWindow):
                 best_schedule = run_genetic_algorithm()
             elif selected_algorithm == "Імітація відпалу":
                 best_schedule = run_simulated_annealing()
+            elif selected_algorithm == "Табу-пошук":
+                best_schedule = run_tabu_search(time_budget=UI_TIME_BUDGET)
+            elif selected_algorithm == "Пошук великих околів":
+                best_schedule = run_lns(time_budget=UI_TIME_BUDGET)
+            elif selected_algorithm == "Точний розв'язувач":
+                best_schedule = run_constraint_solver(time_budget=UI_TIME_BUDGET, minimize_budget=1)
             elif selected_algorithm == "Жадібний алгоритм":
                 best_schedule = run_greedy_algorithm()
             else:  # Випадковий пошук
@@ -0,0 +1,537 @@
+import time
+import logging
+from typing import NamedTuple
+from database.queries import publish_schedule
+from optimization.algorithms.problem import load_problem
+from optimization.algorithms.greedy import Occupancy, SlotDomains, popcount
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FEASIBLE = "feasible"      # Знайдено розклад без жорстких конфліктів
+INFEASIBLE = "infeasible"  # Доведено, що такого розкладу не існує
+UNKNOWN = "unknown"        # Вичерпано ліміт вузлів або часу
+
+# Окремий бюджет часу (секунд) на звуження несумісної множини занять після доведення несумісності
+MINIMIZE_TIME_BUDGET = 10
+
+
+class SolverResult(NamedTuple):
+    """Результат точного розв'язувача."""
+    status: str
+    assignment: list     # (слот, викладач, аудиторія) або None для кожного заняття problem.lessons
+    explanation: tuple   # Несумісна підмножина занять (для INFEASIBLE)
+    irreducible: bool    # Чи доведено, що explanation незвідна (без будь-якого заняття розклад існує)
+    nodes: int
+    elapsed: float
+
+
+class ConstraintSolver:
+    """Повний перебір з поширенням обмежень для жорстких обмежень розкладу.
+
+    Змінні — заняття, значення — (слот, кваліфікований доступний викладач, придатна аудиторія).
+    Після кожного призначення перевіряються домени зачеплених занять (forward checking) і
+    умова Холла для клік занять, що не можуть іти одночасно: усі заняття групи з
+    лабораторними однієї підгрупи та заняття з єдиним можливим викладачем. Відкат —
+    конфліктно-спрямований (CBJ): пошук повертається одразу до найглибшого призначення,
+    причетного до невдачі. lessons обмежує задачу підмножиною занять.
+    """
+
+    def __init__(self, problem, lessons=None, node_limit=100000, deadline=None):
+        self.problem = problem
+        self.node_limit = node_limit
+        self.deadline = deadline
+        self.nodes = 0
+        n_lessons = len(problem.lessons)
+        self.active = set(range(n_lessons)) if lessons is None else set(lessons)
+        self.domains = SlotDomains(problem, Occupancy(problem))
+        self.value = [None] * n_lessons
+        self.unassigned = set(self.active)
+        # Для кожного слота: викладач (аудиторія) → заняття, що його займає; для пояснення невдач
+        self.teacher_owner = [{} for _ in range(problem.n_slots)]
+        self.classroom_owner = [{} for _ in range(problem.n_slots)]
+        # Призначені заняття кожного (блоку конфліктних занять, слот)
+        self.block_owners = {}
+
+        d = self.domains
+        self.initial = [d.domain(lesson_idx) for lesson_idx in range(n_lessons)]
+        # MRV: менший домен, за рівності — менше викладачів і більша група конфліктних занять
+        self.rank = [
+            (len(d.teacher_classes[d.teacher_class[i]]), -len(d.block_lessons[d.block[i]]), i) for i in range(n_lessons)
+        ]
+        self.key = [(popcount(self.initial[i]), self.rank[i]) for i in range(n_lessons)]
+        # Спершу пробуються викладачі й аудиторії, потрібні найменшій кількості інших занять
+        self.teacher_order = [
+            sorted(d.teacher_classes[cls], key=lambda t: len(d.classes_of_teacher[t])) for cls in range(len(d.teacher_classes))
+        ]
+        self.classroom_order = [
+            sorted(d.classroom_classes[cls], key=lambda c: len(d.classes_of_classroom[c]))
+            for cls in range(len(d.classroom_classes))
+        ]
+        self.teacher_sets = [frozenset(members) for members in d.teacher_classes]
+        self.classroom_sets = [frozenset(members) for members in d.classroom_classes]
+        self.cliques, self.lesson_cliques = self._build_cliques()
+        self.pools, self.resource_pools = self._build_pools()
+
+    def _build_cliques(self):
+        """Множини активних занять, що попарно не можуть іти в одному слоті."""
+        problem, d = self.problem, self.domains
+        cliques = []
+        for members in d.block_lessons:
+            members = [m for m in members if m in self.active]
+            lectures = [m for m in members if problem.lessons[m].group >= 0]
+            labs = {}
+            for m in members:
+                if problem.lessons[m].group < 0:
+                    labs.setdefault(problem.lessons[m].subgroup, []).append(m)
+            for clique in [lectures + subgroup_labs for subgroup_labs in labs.values()] or [lectures]:
+                if len(clique) > 1:
+                    cliques.append(clique)
+        for members in d.teacher_class_lessons:
+            members = [m for m in members if m in self.active]
+            if len(members) > 1 and len(d.teacher_classes[d.teacher_class[members[0]]]) == 1:
+                cliques.append(members)
+        lesson_cliques = {m: [] for m in self.active}
+        for idx, clique in enumerate(cliques):
+            for m in clique:
+                lesson_cliques[m].append(idx)
+        return cliques, lesson_cliques
+
+    def _build_pools(self):
+        """Пули ресурсів: клас викладачів (аудиторій) і компонента класів зі спільними ресурсами.
+
+        Повертає пули (вид ресурсу, класи) і пули одного класу для кожного викладача й аудиторії.
+        """
+        d = self.domains
+        self.resources = {
+            "teacher": (d.teacher_free, d.teacher_classes, d.teacher_class_lessons, self.teacher_owner),
+            "classroom": (d.classroom_free, d.classroom_classes, d.classroom_class_lessons, self.classroom_owner),
+        }
+        pools = []
+        resource_pools = {}
+        for kind, (_, classes, class_lessons, _) in self.resources.items():
+            # Компоненти класів, пов'язаних спільними ресурсами
+            component = list(range(len(classes)))
+
+            def root(cls):
+                while component[cls] != cls:
+                    component[cls] = component[component[cls]]
+                    cls = component[cls]
+                return cls
+
+            owner = {}
+            for cls, members in enumerate(classes):
+                for resource in members:
+                    if resource in owner:
+                        component[root(cls)] = root(owner[resource])
+                    owner[resource] = cls
+            merged = {}
+            for cls in range(len(classes)):
+                merged.setdefault(root(cls), []).append(cls)
+            groups = [[cls] for cls in range(len(classes))]
+            groups.extend(group for group in merged.values() if len(group) > 1)
+
+            for group in groups:
+                if not any(m in self.active for cls in group for m in class_lessons[cls]):
+                    continue
+                # Під час перебору перевіряються лише пули одного класу, компоненти — до його початку
+                if len(group) == 1:
+                    for resource in classes[group[0]]:
+                        resource_pools.setdefault((kind, resource), []).append(len(pools))
+                pools.append((kind, group))
+        return pools, resource_pools
+
+    def _pool_violation(self, pool_idx):
+        """Повертає незапланованих членів пулу, якщо їм не вистачає вільних пар (ресурс, слот).
+
+        Пара враховується, лише якщо слот ще є в домені хоча б одного заняття, якому підходить ресурс.
+        """
+        kind, group = self.pools[pool_idx]
+        free, classes, class_lessons, _ = self.resources[kind]
+        members = []
+        reach = {}
+        for cls in group:
+            mask = 0
+            for m in class_lessons[cls]:
+                if m in self.unassigned:
+                    members.append(m)
+                    mask |= self.domains.domain(m)
+            for resource in classes[cls]:
+                reach[resource] = reach.get(resource, 0) | mask
+        capacity = sum(popcount(free[resource] & mask) for resource, mask in reach.items())
+        return members[:capacity + 1] if len(members) > capacity else None
+
+    def _conflicts_in_time(self, first, second):
+        lessons = self.problem.lessons
+        if self.domains.block[first] != self.domains.block[second]:
+            return False
+        return lessons[first].group >= 0 or lessons[second].group >= 0 or lessons[first].subgroup == lessons[second].subgroup
+
+    def explain(self, lesson_idx):
+        """Призначені заняття, через які з домену заняття зникли слоти."""
+        d = self.domains
+        reasons = set()
+        lost = self.initial[lesson_idx] & ~d.domain(lesson_idx)
+        busy = d.occupancy.busy_slots(self.problem.lessons[lesson_idx])
+        teachers = self.teacher_sets[d.teacher_class[lesson_idx]]
+        classrooms = self.classroom_sets[d.classroom_class[lesson_idx]]
+        for slot in range(self.problem.n_slots):
+            if not lost >> slot & 1:
+                continue
+            if busy >> slot & 1:
+                reasons.update(
+                    m for m in self.block_owners.get((d.block[lesson_idx], slot), ())
+                    if self._conflicts_in_time(lesson_idx, m)
+                )
+            elif not d.teacher_union[d.teacher_class[lesson_idx]] >> slot & 1:
+                reasons.update(m for t, m in self.teacher_owner[slot].items() if t in teachers)
+            else:
+                reasons.update(m for c, m in self.classroom_owner[slot].items() if c in classrooms)
+        return reasons
+
+    def _hall_violation(self, clique_idx):
+        """Повертає незапланованих членів кліки, якщо їм не вистачає різних слотів."""
+        members = [m for m in self.cliques[clique_idx] if m in self.unassigned]
+        union = 0
+        for m in members:
+            union |= self.domains.domain(m)
+        # Для суперечності досить будь-яких |union| + 1 занять
+        return members[:popcount(union) + 1] if len(members) > popcount(union) else None
+
+    def _clique_options(self, clique_idx):
+        members = [m for m in self.cliques[clique_idx] if m in self.unassigned]
+        slots = range(self.problem.n_slots)
+        return members, lambda m: [s for s in slots if self.domains.domain(m) >> s & 1]
+
+    def _pool_options(self, pool_idx):
+        kind, group = self.pools[pool_idx]
+        free, classes, class_lessons, _ = self.resources[kind]
+        members = [m for cls in group for m in class_lessons[cls] if m in self.unassigned]
+        lesson_class = self.domains.teacher_class if kind == "teacher" else self.domains.classroom_class
+        slots = range(self.problem.n_slots)
+
+        def options(m):
+            domain = self.domains.domain(m)
+            return [(r, s) for r in classes[lesson_class[m]] for s in slots if (free[r] & domain) >> s & 1]
+        return members, options
+
+    def _update_keys(self, affected):
+        for m in affected:
+            if m in self.unassigned:
+                self.key[m] = (popcount(self.domains.domain(m)), self.rank[m])
+
+    def _assign(self, lesson_idx, value):
+        """Призначає значення; повертає None або (причини невдачі, заняття, на яких вона виявилася)."""
+        slot, teacher, classroom = value
+        self.value[lesson_idx] = value
+        self.unassigned.discard(lesson_idx)
+        self.teacher_owner[slot][teacher] = lesson_idx
+        self.block_owners.setdefault((self.domains.block[lesson_idx], slot), set()).add(lesson_idx)
+        self.classroom_owner[slot][classroom] = lesson_idx
+        affected = self.domains.place(lesson_idx, slot, teacher, classroom)
+        self._update_keys(affected)
+
+        for m in affected:
+            if m in self.unassigned and not self.domains.domain(m):
+                return self.explain(m), {m}
+        cliques = set(self.lesson_cliques[lesson_idx])
+        for m in affected:
+            if m in self.unassigned:
+                cliques.update(self.lesson_cliques[m])
+        for clique_idx in cliques:
+            members = self._hall_violation(clique_idx)
+            if members:
+                return set().union(*(self.explain(m) for m in members)), set(members)
+        for pool_idx in self.resource_pools.get(("teacher", teacher), []) + self.resource_pools.get(("classroom", classroom), []):
+            members = self._pool_violation(pool_idx)
+            if members:
+                kind, group = self.pools[pool_idx]
+                _, classes, _, owner = self.resources[kind]
+                reasons = self._owners(owner, {r for cls in group for r in classes[cls]})
+                return reasons.union(*(self.explain(m) for m in members)), set(members)
+        return None
+
+    def _unassign(self, lesson_idx):
+        slot, teacher, classroom = self.value[lesson_idx]
+        self.value[lesson_idx] = None
+        self.unassigned.add(lesson_idx)
+        del self.teacher_owner[slot][teacher]
+        self.block_owners[self.domains.block[lesson_idx], slot].discard(lesson_idx)
+        del self.classroom_owner[slot][classroom]
+        affected = self.domains.remove(lesson_idx, slot, teacher, classroom)
+        affected.append(lesson_idx)
+        self._update_keys(affected)
+
+    def _values(self, lesson_idx, conflicts):
+        """Значення домену: слоти від найменш завантажених; взаємозамінні викладачі й аудиторії пропускаються.
+
+        Взаємозамінність (ті самі класи і ті самі вільні слоти) тримається на зайнятості обох
+        ресурсів, тому їхні власники додаються до conflicts.
+        """
+        d = self.domains
+        domain = d.domain(lesson_idx)
+        slots = sorted((s for s in range(self.problem.n_slots) if domain >> s & 1), key=d.occupancy.slot_load.__getitem__)
+        teachers = self.teacher_order[d.teacher_class[lesson_idx]]
+        classrooms = self.classroom_order[d.classroom_class[lesson_idx]]
+        for slot in slots:
+            tried_teachers = {}
+            for teacher in teachers:
+                if not d.teacher_free[teacher] >> slot & 1:
+                    continue
+                signature = (tuple(d.classes_of_teacher[teacher]), d.teacher_free[teacher])
+                if signature in tried_teachers:
+                    conflicts.update(self._owners(self.teacher_owner, (teacher, tried_teachers[signature])))
+                    continue
+                tried_teachers[signature] = teacher
+                tried_classrooms = {}
+                for classroom in classrooms:
+                    if not d.classroom_free[classroom] >> slot & 1:
+                        continue
+                    signature = (tuple(d.classes_of_classroom[classroom]), d.classroom_free[classroom])
+                    if signature in tried_classrooms:
+                        conflicts.update(self._owners(self.classroom_owner, (classroom, tried_classrooms[signature])))
+                        continue
+                    tried_classrooms[signature] = classroom
+                    yield slot, teacher, classroom
+
+    @staticmethod
+    def _owners(owner, resources):
+        return {slot_owner[r] for slot_owner in owner for r in resources if r in slot_owner}
+
+    def _select(self):
+        return min(self.unassigned, key=self.key.__getitem__) if self.unassigned else None
+
+    def _out_of_budget(self):
+        if self.nodes >= self.node_limit:
+            return True
+        return self.deadline is not None and self.nodes % 64 == 0 and time.perf_counter() >= self.deadline
+
+    def search(self):
+        """Повертає статус і заняття, причетні до доведеної несумісності."""
+        # Порожній домен або нестача слотів ще до пошуку
+        for lesson_idx in self.unassigned:
+            if not self.initial[lesson_idx]:
+                return INFEASIBLE, {lesson_idx}
+        for clique_idx in range(len(self.cliques)):
+            members = self._hall_violation(clique_idx)
+            if members:
+                return INFEASIBLE, set(members)
+        for pool_idx in range(len(self.pools)):
+            members = self._pool_violation(pool_idx)
+            if members:
+                return INFEASIBLE, set(members)
+        # Точніша перевірка паросполученням: слоти для клік, пари (ресурс, слот) для пулів
+        for clique_idx in range(len(self.cliques)):
+            violator = hall_violator(*self._clique_options(clique_idx))
+            if violator:
+                return INFEASIBLE, violator
+        for pool_idx in range(len(self.pools)):
+            violator = hall_violator(*self._pool_options(pool_idx))
+            if violator:
+                return INFEASIBLE, violator
+
+        # Кадр: [заняття, генератор значень, множина конфліктів, причетні заняття, чи призначене]
+        lesson_idx = self._select()
+        if lesson_idx is None:
+            return FEASIBLE, set()
+        conflicts = set()
+        stack = [[lesson_idx, self._values(lesson_idx, conflicts), conflicts, set(), False]]
+        while stack:
+            if self._out_of_budget():
+                return UNKNOWN, set()
+            frame = stack[-1]
+            lesson_idx, values, conflicts, culprits, assigned = frame
+            if assigned:
+                self._unassign(lesson_idx)
+                frame[4] = False
+
+            value = next(values, None)
+            if value is None:
+                # Значення вичерпано: стрибок до найглибшого заняття з множини конфліктів
+                stack.pop()
+                culprits.add(lesson_idx)
+                if not conflicts:
+                    return INFEASIBLE, culprits
+                while stack[-1][0] not in conflicts:
+                    skipped = stack.pop()
+                    self._unassign(skipped[0])
+                target = stack[-1]
+                target[2].update(conflicts - {target[0]})
+                target[3].update(culprits, conflicts)
+                continue
+
+            self.nodes += 1
+            frame[4] = True
+            failure = self._assign(lesson_idx, value)
+            if failure is not None:
+                reasons, failed = failure
+                conflicts.update(reasons - {lesson_idx})
+                culprits.update(failed)
+                continue
+
+            lesson_idx = self._select()
+            if lesson_idx is None:
+                return FEASIBLE, set()
+            # Значення, відсічені раніше, теж входять до множини конфліктів
+            conflicts = self.explain(lesson_idx)
+            stack.append([lesson_idx, self._values(lesson_idx, conflicts), conflicts, set(), False])
+        return INFEASIBLE, set()
+
+    def assignment(self):
+        return list(self.value)
+
+
+def hall_violator(members, options):
+    """Шукає паросполучення занять з варіантами (слотами чи парами ресурс-слот), де варіант — не більше одного заняття.
+
+    Якщо повного паросполучення немає, повертає заняття, досяжні з непоєднаного чергуючими
+    шляхами: разом їм доступно на один варіант менше, ніж їх самих (порушення умови Холла).
+    """
+    adjacency = {m: options(m) for m in members}
+    matched = {}
+    # Жадібне початкове паросполучення; збільшувальні шляхи шукаються лише для решти
+    unmatched = []
+    for lesson in members:
+        option = next((option for option in adjacency[lesson] if option not in matched), None)
+        if option is None:
+            unmatched.append(lesson)
+        else:
+            matched[option] = lesson
+    for start in unmatched:
+        # Ітеративний пошук збільшувального шляху
+        visited = {start}
+        seen = set()
+        stack = [(start, iter(adjacency[start]))]
+        path = []
+        found = False
+        while stack and not found:
+            lesson, candidates = stack[-1]
+            for option in candidates:
+                if option in seen:
+                    continue
+                seen.add(option)
+                owner = matched.get(option)
+                if owner is None:
+                    path.append((lesson, option))
+                    found = True
+                elif owner not in visited:
+                    visited.add(owner)
+                    path.append((lesson, option))
+                    stack.append((owner, iter(adjacency[owner])))
+                break
+            else:
+                stack.pop()
+                if path:
+                    path.pop()
+        if not found:
+            return visited
+        for lesson, option in path:
+            matched[option] = lesson
+    return None
+
+
+def minimize_explanation(problem, lessons, node_limit=2000, deadline=None):
+    """Звужує несумісну множину занять, прибираючи по одному заняттю, поки решта лишається несумісною.
+
+    Повертає (множина, незвідна). Незвідність доведена, лише якщо перевірено всі заняття і жодна
+    перевірка не вперлася в node_limit чи deadline; інакше множина несумісна, але може містити зайві.
+    """
+    core = sorted(lessons)
+    necessary = set()
+    proven = True
+    while True:
+        candidates = [m for m in core if m not in necessary]
+        if not candidates:
+            return tuple(core), proven
+        if deadline is not None and time.perf_counter() >= deadline:
+            return tuple(core), False
+        trial = [m for m in core if m != candidates[0]]
+        solver = ConstraintSolver(problem, trial, node_limit, deadline)
+        status, culprits = solver.search()
+        if status != INFEASIBLE:
+            # Без заняття розклад знайдено (FEASIBLE) або не вдалося з'ясувати (UNKNOWN) — заняття лишається
+            necessary.add(candidates[0])
+            proven = proven and status == FEASIBLE
+        elif solver.nodes == 0:
+            # Суперечність, знайдена до перебору, сама є несумісною підмножиною
+            core = sorted(culprits)
+        else:
+            core = trial
+
+
+def solve(problem, node_limit=100000, time_budget=None, minimize_budget=MINIMIZE_TIME_BUDGET):
+    """Шукає розклад без жорстких конфліктів або доводить, що його немає.
+
+    time_budget обмежує пошук, minimize_budget — окремо звуження пояснення несумісності (секунд).
+    """
+    started = time.perf_counter()
+    deadline = started + time_budget if time_budget else None
+    solver = ConstraintSolver(problem, node_limit=node_limit, deadline=deadline)
+    status, culprits = solver.search()
+    explanation, irreducible = (), False
+    if status == INFEASIBLE:
+        minimize_deadline = time.perf_counter() + minimize_budget if minimize_budget else None
+        # Причетні заняття мають бути несумісними й самі по собі; інакше пояснюємо з усіх занять
+        check = INFEASIBLE if solver.nodes == 0 else (
+            ConstraintSolver(problem, culprits, node_limit, minimize_deadline).search()[0]
+        )
+        candidates = culprits if check == INFEASIBLE else range(len(problem.lessons))
+        explanation, irreducible = minimize_explanation(problem, candidates, deadline=minimize_deadline)
+    return SolverResult(status, solver.assignment(), explanation, irreducible, solver.nodes,
+                        time.perf_counter() - started)
+
+
+def describe_lesson(problem, lesson_idx):
+    """Опис заняття для журналу."""
+    lesson = problem.lessons[lesson_idx]
+    discipline = problem.discipline_names[lesson.discipline]
+    if lesson.group >= 0:
+        return f"лекція групи {problem.group_names[lesson.group]}, дисципліна {discipline}"
+    return f"лабораторна підгрупи {problem.subgroup_names[lesson.subgroup]}, дисципліна {discipline}"
+
+
+def run_constraint_solver(problem=None, node_limit=100000, time_budget=60, minimize_budget=MINIMIZE_TIME_BUDGET):
+    """Запускає точний розв'язувач жорстких обмежень.
+
+    Зберігає і повертає розклад, якщо він існує; якщо доведено, що розкладу немає,
+    журналює підмножину занять, які неможливо розмістити разом (незвідну, якщо це вдалося
+    довести за minimize_budget секунд), і повертає [].
+    """
+    logger.info("Запуск точного розв'язувача...")
+    problem = problem or load_problem()
+    result = solve(problem, node_limit, time_budget, minimize_budget)
+    logger.info(f"Вузлів: {result.nodes}, час: {result.elapsed:.2f} с")
+
+    if result.status == INFEASIBLE:
+        if result.irreducible:
+            logger.warning(f"Розкладу без конфліктів не існує. Незвідна множина несумісних занять "
+                           f"({len(result.explanation)}):")
+        else:
+            logger.warning(f"Розкладу без конфліктів не існує. Несумісні заняття ({len(result.explanation)}); "
+                           f"незвідність не доведена, множина може містити зайві заняття:")
+        for lesson_idx in result.explanation:
+            logger.warning(f"  {describe_lesson(problem, lesson_idx)}")
+        return []
+    if result.status == UNKNOWN:
+        logger.warning("Ліміт вузлів або часу вичерпано, розклад не знайдено")
+        return []
+
+    schedule = [problem.make_slot(lesson, *value) for lesson, value in zip(problem.lessons, result.assignment)]
+
+    # Збереження розкладу в базу
+    try:
+        publish_schedule(schedule, "constraint_solver", dict(node_limit=node_limit, time_budget=time_budget),
+                         fitness=0, duration=result.elapsed)
+        logger.info("Розклад збережено в базу даних")
+    except Exception as e:
+        logger.error(f"Помилка збереження розкладу: {e}")
+
+    logger.info(f"Оптимізація завершена. Занять: {len(schedule)}")
+    return schedule
+
+if __name__ == "__main__":
+    try:
+        best_schedule = run_constraint_solver()
+        logger.info("Найкращий розклад")
+    except Exception as e:
+        logger.error(f"Помилка: {e}")
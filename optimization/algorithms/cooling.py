@@ -0,0 +1,95 @@
+import math
+import time
+from dataclasses import dataclass
+from optimization.algorithms.moves import random_move
+
+
+@dataclass
+class AnnealingScheduler:
+    """Розклад температури відпалу.
+
+    Типові значення відтворюють класичний відпал: T = 1000, T *= 0.995 на кожному кроці,
+    зупинка за T_min, max_iterations або стагнацією. Додатково підтримуються бюджет часу,
+    калібрування початкової температури, адаптивне охолодження і підігрів.
+    """
+    T: float = 1000.0                # Початкова температура; None — калібрувати за вибіркою ходів
+    T_min: float = 0.01              # Кінцева температура
+    alpha: float = 0.995             # Коефіцієнт охолодження за крок
+    max_iterations: int = 10000      # Максимум ітерацій (без бюджету часу)
+    stagnation_limit: int = 2000     # Ліміт ітерацій без покращення
+    time_budget: float = None        # Секунд на відпал; охолодження розтягується на весь бюджет
+    initial_acceptance: float = 0.8  # Бажана імовірність прийняти погіршення на старті (для калібрування)
+    calibration_moves: int = 200     # Кількість пробних ходів для калібрування
+    target_acceptance: float = None  # Цільова частка прийнятих ходів для адаптивного охолодження
+    reheat: float = None             # При стагнації: підігрів до reheat × початкова T замість зупинки
+    window: int = 100                # Період (у кроках) перерахунку охолодження
+
+    @classmethod
+    def for_time_budget(cls, seconds):
+        """Розклад «найкращий результат за seconds секунд»: калібрування, адаптація і підігрів."""
+        return cls(T=None, time_budget=seconds, target_acceptance=0.05, reheat=0.3)
+
+    def start(self, chain):
+        """Готує розклад до запуску ланцюга (за потреби калібрує початкову температуру)."""
+        self.temperature = self.T if self.T is not None else self.calibrate(chain)
+        self.initial_temperature = self.temperature
+        self.iteration = 0
+        self.stagnation = 0
+        self.reheats = 0
+        self._alpha = self.alpha
+        self._accepted = chain.accepted
+        self._started = time.perf_counter()
+        self._deadline = self._started + self.time_budget if self.time_budget else None
+
+    def calibrate(self, chain):
+        """Температура, за якої середнє погіршення приймається з імовірністю initial_acceptance."""
+        worse = []
+        for _ in range(self.calibration_moves):
+            move = random_move(chain.evaluator, chain.problem)
+            delta = move.apply(chain.evaluator)
+            move.undo(chain.evaluator)
+            if delta > 0:
+                worse.append(delta)
+        if not worse:
+            return max(self.T_min, 1.0)
+        return max(self.T_min, -(sum(worse) / len(worse)) / math.log(self.initial_acceptance))
+
+    def active(self):
+        """Чи продовжувати відпал."""
+        if self._deadline is not None:
+            # Час перевіряється раз на window кроків
+            return self.iteration % self.window != 0 or time.perf_counter() < self._deadline
+        return self.temperature > self.T_min and self.iteration < self.max_iterations
+
+    def update(self, improved, chain):
+        """Оновлює температуру після кроку; повертає False при зупинці за стагнацією."""
+        self.stagnation = 0 if improved else self.stagnation + 1
+        if self.stagnation > self.stagnation_limit:
+            if self.reheat is None:
+                return False
+            self.temperature = max(self.temperature, self.reheat * self.initial_temperature)
+            self.stagnation = 0
+            self.reheats += 1
+
+        self.temperature *= self._alpha
+        self.iteration += 1
+        if self.iteration % self.window == 0:
+            self._adapt(chain)
+        return True
+
+    def _adapt(self, chain):
+        if self._deadline is not None:
+            # Коефіцієнт, з яким T дійде до T_min саме на кінці бюджету за поточної швидкості кроків
+            now = time.perf_counter()
+            remaining = (self._deadline - now) * self.iteration / max(now - self._started, 1e-9)
+            if self.temperature > self.T_min and remaining >= 1:
+                self._alpha = (self.T_min / self.temperature) ** (1 / remaining)
+            else:
+                self._alpha = 1.0
+                self.temperature = max(self.temperature, self.T_min)
+        if self.target_acceptance:
+            # Забагато прийнятих ходів — охолоджуємо швидше, замало — повільніше
+            ratio = (chain.accepted - self._accepted) / self.window
+            speed = min(max(ratio / self.target_acceptance, 0.5), 2.0)
+            self.temperature *= self._alpha ** (self.window * (speed - 1))
+        self._accepted = chain.accepted
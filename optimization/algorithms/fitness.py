@@ -0,0 +1,337 @@
+import hashlib
+import weakref
+from collections import OrderedDict
+from typing import NamedTuple
+import numpy as np
+from optimization.algorithms.problem import LESSON_TYPE_CODES, LECTURE, LAB, DAYS
+
+
+class Penalties(NamedTuple):
+    """Ваги штрафів цільової функції."""
+    group_overlap: float         # за кожне друге і наступне заняття групи в одному слоті
+    subgroup_overlap: float      # те саме для підгрупи
+    lecture_lab_overlap: float   # за пару «лекція групи — лабораторна її підгрупи» в одному слоті
+    teacher_overlap: float       # за пару занять одного викладача в одному слоті
+    classroom_overlap: float     # за пару занять в одній аудиторії в одному слоті
+    sibling_subgroups: float     # за пару занять різних підгруп однієї групи в одному слоті
+    overload: float              # за кожне заняття понад max_load, наростаючим підсумком
+    availability: float          # заняття поза доступністю викладача
+    classroom_mismatch: float    # невідповідний тип або місткість аудиторії
+    afternoon_lecture: float     # лекція о 12:00 чи 13:30
+    day_imbalance_excess: float  # (count - avg) за перевантажений день групи
+    day_imbalance_count: float   # count за перевантажений день групи
+    teacher_gap: float           # «вікна» у дні викладача
+    missing_discipline: float    # дисципліна без лекції (групи) чи лабораторної (підгрупи)
+
+
+# Ваги, що відтворюють evaluate_schedule генетичного алгоритму
+GENETIC_PENALTIES = Penalties(
+    group_overlap=10, subgroup_overlap=10, lecture_lab_overlap=0, teacher_overlap=1, classroom_overlap=1,
+    sibling_subgroups=1, overload=10, availability=1, classroom_mismatch=5, afternoon_lecture=2,
+    day_imbalance_excess=5, day_imbalance_count=0, teacher_gap=5, missing_discipline=10,
+)
+
+# Ваги, що відтворюють evaluate_schedule імітації відпалу
+ANNEALING_PENALTIES = Penalties(
+    group_overlap=1, subgroup_overlap=1, lecture_lab_overlap=2, teacher_overlap=1, classroom_overlap=1,
+    sibling_subgroups=1, overload=2, availability=2, classroom_mismatch=2, afternoon_lecture=0,
+    day_imbalance_excess=0, day_imbalance_count=1, teacher_gap=0, missing_discipline=2,
+)
+
+# Лише жорсткі конфлікти: накладки груп, підгруп, лекцій і лабораторних, викладачів і аудиторій
+HARD_PENALTIES = Penalties(
+    group_overlap=1, subgroup_overlap=1, lecture_lab_overlap=1, teacher_overlap=1, classroom_overlap=1,
+    sibling_subgroups=0, overload=0, availability=0, classroom_mismatch=0, afternoon_lecture=0,
+    day_imbalance_excess=0, day_imbalance_count=0, teacher_gap=0, missing_discipline=0,
+)
+
+
+class EncodedSchedule(NamedTuple):
+    """Розклад у вигляді паралельних цілочисельних масивів (індекси ProblemInstance, -1 — відсутній)."""
+    slot: np.ndarray
+    teacher: np.ndarray
+    classroom: np.ndarray
+    group: np.ndarray
+    subgroup: np.ndarray
+    lesson_type: np.ndarray
+    discipline: np.ndarray
+    student_count: np.ndarray
+
+
+def encode_schedule(schedule, problem):
+    """Перетворює список словників-занять на EncodedSchedule."""
+    slot_index = problem.slot_index
+    teacher_index = problem.teacher_index
+    classroom_index = problem.classroom_index
+    group_index = problem.group_index
+    subgroup_index = problem.subgroup_index
+    discipline_index = problem.discipline_index
+    rows = [
+        (
+            slot_index[s["time_slot"]],
+            teacher_index.get(s["teacher_id"], -1),
+            classroom_index.get(s["classroom_id"], -1),
+            group_index.get(s.get("group_id"), -1),
+            subgroup_index.get(s.get("subgroup_id"), -1),
+            LESSON_TYPE_CODES.get(s["lesson_type"], -1),
+            discipline_index.get(s["discipline_id"], -1),
+            s.get("group_student_count", 0) if s.get("group_id") else s.get("subgroup_student_count", 0),
+        )
+        for s in schedule
+    ]
+    columns = np.array(rows, dtype=np.int64).reshape(len(rows), len(EncodedSchedule._fields)).T
+    return EncodedSchedule(*columns)
+
+
+def decode_schedule(enc, problem):
+    """Перетворює EncodedSchedule назад на список словників-занять."""
+    lesson_types = {code: name for name, code in LESSON_TYPE_CODES.items()}
+    schedule = []
+    for slot, teacher, classroom, group, subgroup, lesson_type, discipline, student_count in zip(*map(list, enc)):
+        group_id = int(problem.group_ids[group]) if group >= 0 else None
+        subgroup_id = int(problem.subgroup_ids[subgroup]) if subgroup >= 0 else None
+        schedule.append({
+            "group_id": group_id,
+            "subgroup_id": subgroup_id,
+            "teacher_id": int(problem.teacher_ids[teacher]),
+            "classroom_id": int(problem.classroom_ids[classroom]),
+            "discipline_id": int(problem.discipline_ids[discipline]),
+            "lesson_type": lesson_types[lesson_type],
+            "time_slot": problem.time_slots[slot],
+            "group_student_count": student_count if group_id else 0,
+            "subgroup_student_count": student_count if subgroup_id else 0,
+        })
+    return schedule
+
+
+def day_imbalance(increments):
+    """Штраф за нерівномірність, що накопичується після кожного слота.
+
+    increments — масив (слоти в порядку появи, групи, дні) з кількістю лекцій.
+    Повертає для кожної групи суму count і суму (days * count - total) за всі
+    перевантажені дні (count > avg + 1) усіх префіксів.
+    """
+    n_days = increments.shape[2]
+    counts = increments.cumsum(axis=0)
+    totals = counts.sum(axis=2, keepdims=True)
+    # count > avg + 1 у цілих числах: days * count > total + days
+    excess = n_days * counts - totals
+    heavy = excess > n_days
+    return np.where(heavy, counts, 0).sum(axis=(0, 2)), np.where(heavy, excess, 0).sum(axis=(0, 2))
+
+
+def teacher_gaps(increments, periods, n_slots):
+    """Кількість «вікон» викладачів, що накопичується після кожного слота.
+
+    increments — масив (слоти в порядку появи, викладачі, дні) з кількістю занять,
+    periods — номер пари кожного слота в тому ж порядку.
+    """
+    present = increments > 0
+    period = periods[:, None, None]
+    first_period = np.minimum.accumulate(np.where(present, period, n_slots), axis=0)
+    last_period = np.maximum.accumulate(np.where(present, period, -1), axis=0)
+    counts = increments.cumsum(axis=0)
+    gaps = (counts > 1) & (last_period - first_period + 1 > counts)
+    return np.count_nonzero(gaps, axis=(0, 2))
+
+
+def _excess(keys, size):
+    """Кількість елементів понад перший для кожного ключа."""
+    return len(keys) - int(np.count_nonzero(np.bincount(keys, minlength=size)))
+
+
+def _pairs(keys, size):
+    """Кількість пар елементів з однаковим ключем."""
+    counts = np.bincount(keys, minlength=size)
+    return int((counts * (counts - 1)).sum() // 2)
+
+
+class FitnessEvaluator:
+    """Векторизована оцінка розкладу на NumPy.
+
+    Дає ті самі значення, що й попередня покрокова реалізація, зокрема
+    штрафи за рівномірність і «вікна», які нараховуються після обробки
+    кожного часового слота в порядку їх першої появи в розкладі.
+    """
+
+    def __init__(self, problem, penalties):
+        self.problem = problem
+        self.penalties = penalties
+        self.available = problem.teacher_available
+        # Незмінні стовпці занять problem.lessons для розкладів, заданих лише призначеннями
+        self.lessons = EncodedSchedule(
+            *np.zeros((3, len(problem.lessons)), dtype=np.int64),
+            group=np.array([lesson.group for lesson in problem.lessons], dtype=np.int64),
+            subgroup=np.array([lesson.subgroup for lesson in problem.lessons], dtype=np.int64),
+            lesson_type=np.array([LESSON_TYPE_CODES[lesson.lesson_type] for lesson in problem.lessons], dtype=np.int64),
+            discipline=np.array([lesson.discipline for lesson in problem.lessons], dtype=np.int64),
+            student_count=np.array([lesson.student_count for lesson in problem.lessons], dtype=np.int64),
+        )
+
+    def evaluate(self, schedule):
+        """Оцінює розклад у форматі списку словників."""
+        return self.evaluate_encoded(encode_schedule(schedule, self.problem))
+
+    def encode_assignment(self, assignment):
+        """Будує EncodedSchedule з масиву (заняття × [слот, викладач, аудиторія]) у порядку problem.lessons."""
+        slot, teacher, classroom = np.asarray(assignment, dtype=np.int64).T
+        return self.lessons._replace(slot=slot, teacher=teacher, classroom=classroom)
+
+    def evaluate_assignment(self, assignment):
+        """Оцінює розклад, заданий лише призначеннями занять problem.lessons."""
+        return self.evaluate_encoded(self.encode_assignment(assignment))
+
+    def evaluate_encoded(self, enc):
+        """Оцінює закодований розклад і повертає сумарний штраф."""
+        p = self.problem
+        w = self.penalties
+        n_slots, n_groups, n_subgroups = p.n_slots, p.n_groups, p.n_subgroups
+        n_teachers, n_classrooms, n_days = p.n_teachers, p.n_classrooms, len(DAYS)
+        slot = enc.slot
+        total = 0
+
+        has_group = enc.group >= 0
+        has_subgroup = enc.subgroup >= 0
+        parent = np.where(has_subgroup, p.subgroup_group[np.maximum(enc.subgroup, 0)], -1)
+        has_parent = has_subgroup & (parent >= 0)
+
+        # Накладки груп, підгруп, викладачів і аудиторій
+        group_keys = slot[has_group] * n_groups + enc.group[has_group]
+        if w.group_overlap:
+            total += w.group_overlap * _excess(group_keys, n_slots * n_groups)
+        if w.subgroup_overlap:
+            keys = slot[has_subgroup] * n_subgroups + enc.subgroup[has_subgroup]
+            total += w.subgroup_overlap * _excess(keys, n_slots * n_subgroups)
+        if w.teacher_overlap:
+            known = enc.teacher >= 0
+            total += w.teacher_overlap * _pairs(slot[known] * n_teachers + enc.teacher[known], n_slots * n_teachers)
+        if w.classroom_overlap:
+            known = enc.classroom >= 0
+            keys = slot[known] * n_classrooms + enc.classroom[known]
+            total += w.classroom_overlap * _pairs(keys, n_slots * n_classrooms)
+
+        # Лекції групи одночасно з заняттями її підгруп і підгрупи однієї групи між собою
+        parent_counts = np.bincount(slot[has_parent] * n_groups + parent[has_parent], minlength=n_slots * n_groups)
+        if w.lecture_lab_overlap:
+            lecture_counts = np.bincount(group_keys, minlength=n_slots * n_groups)
+            total += w.lecture_lab_overlap * int(lecture_counts @ parent_counts)
+        if w.sibling_subgroups:
+            subgroup_counts = np.bincount(
+                slot[has_parent] * n_subgroups + enc.subgroup[has_parent], minlength=n_slots * n_subgroups
+            )
+            total += w.sibling_subgroups * int(
+                ((parent_counts ** 2).sum() - (subgroup_counts ** 2).sum()) // 2
+            )
+
+        # Навантаження і доступність викладачів
+        known_teacher = enc.teacher >= 0
+        if w.overload:
+            load = np.bincount(enc.teacher[known_teacher], minlength=n_teachers)
+            over = np.maximum(load - p.teacher_max_load, 0)
+            total += w.overload * int((over * (over + 1)).sum() // 2)
+        if w.availability:
+            missed = ~self.available[enc.teacher[known_teacher], slot[known_teacher]]
+            total += w.availability * int(np.count_nonzero(missed))
+
+        # Тип і місткість аудиторії
+        if w.classroom_mismatch:
+            known = enc.classroom >= 0
+            room = enc.classroom[known]
+            room_type = p.classroom_type[room]
+            capacity = p.classroom_capacity[room]
+            students = enc.student_count[known]
+            lesson_type = enc.lesson_type[known]
+            bad_lecture = (lesson_type == LECTURE) & ((room_type != LECTURE) | (students > capacity))
+            bad_lab = (lesson_type == LAB) & ((room_type != LAB) | (2 * students > capacity))
+            total += w.classroom_mismatch * int(np.count_nonzero(bad_lecture | bad_lab))
+
+        if w.afternoon_lecture:
+            late = (enc.lesson_type == LECTURE) & (p.slot_period[slot] >= 2)
+            total += w.afternoon_lecture * int(np.count_nonzero(late))
+
+        # Штрафи, що накопичуються після кожного слота в порядку першої появи
+        fraction = 0
+        if len(slot) and (w.day_imbalance_excess or w.day_imbalance_count or w.teacher_gap):
+            used, first = np.unique(slot, return_index=True)
+            used = used[np.argsort(first)]
+            rank = np.empty(n_slots, dtype=np.int64)
+            rank[used] = np.arange(len(used))
+            lesson_rank = rank[slot]
+            lesson_day = p.slot_day[slot]
+
+            if w.day_imbalance_excess or w.day_imbalance_count:
+                keys = (lesson_rank[has_group] * n_groups + enc.group[has_group]) * n_days + lesson_day[has_group]
+                counts = np.bincount(keys, minlength=len(used) * n_groups * n_days)
+                heavy_count, heavy_excess = day_imbalance(counts.reshape(len(used), n_groups, n_days))
+                total += w.day_imbalance_count * int(heavy_count.sum())
+                if w.day_imbalance_excess:
+                    fraction = w.day_imbalance_excess * int(heavy_excess.sum()) / n_days
+
+            if w.teacher_gap:
+                keys = (lesson_rank[known_teacher] * n_teachers + enc.teacher[known_teacher]) * n_days
+                keys += lesson_day[known_teacher]
+                counts = np.bincount(keys, minlength=len(used) * n_teachers * n_days)
+                gaps = teacher_gaps(counts.reshape(len(used), n_teachers, n_days), p.slot_period[used], n_slots)
+                total += w.teacher_gap * int(gaps.sum())
+
+        # Відсутні дисципліни
+        if w.missing_discipline:
+            n_disciplines = p.n_disciplines
+            lectures = has_group & (enc.discipline >= 0)
+            labs = has_subgroup & ~has_group & (enc.discipline >= 0)
+            covered_lectures = np.count_nonzero(np.bincount(
+                enc.group[lectures] * n_disciplines + enc.discipline[lectures], minlength=n_groups * n_disciplines
+            ))
+            covered_labs = np.count_nonzero(np.bincount(
+                enc.subgroup[labs] * n_disciplines + enc.discipline[labs], minlength=n_subgroups * n_disciplines
+            ))
+            missing = (n_groups + n_subgroups) * n_disciplines - covered_lectures - covered_labs
+            total += w.missing_discipline * int(missing)
+
+        return total + fraction if fraction else total
+
+
+_evaluators = weakref.WeakKeyDictionary()
+
+
+def get_evaluator(problem, penalties):
+    """Повертає (і кешує на час життя problem) оцінювач для заданих ваг."""
+    cache = _evaluators.setdefault(problem, {})
+    if penalties not in cache:
+        cache[penalties] = FitnessEvaluator(problem, penalties)
+    return cache[penalties]
+
+
+class FitnessCache:
+    """Обмежений LRU-кеш значень фітнесу, ключ — хеш вмісту масиву призначень."""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._values = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(assignment):
+        """128-бітний BLAKE2-хеш байтів масиву."""
+        return hashlib.blake2b(np.ascontiguousarray(assignment).tobytes(), digest_size=16).digest()
+
+    def get(self, key):
+        """Повертає збережене значення (або None) і рахує влучання та промахи."""
+        value = self._values.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._values.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._values[key] = value
+        self._values.move_to_end(key)
+        while len(self._values) > self.maxsize:
+            self._values.popitem(last=False)
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
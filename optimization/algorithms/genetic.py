@@ -1,259 +1,305 @@
+import queue
 import random
-import json
+import time
 import logging
+import multiprocessing
+import numpy as np
 from deap import base, creator, tools, algorithms
-from database.queries import (
-    get_teacher_by_id, get_classroom_by_id, get_subgroup_by_id, get_discipline_by_id, get_teachers_for_discipline,
-    Session, add_schedule
-)
-from database.models import Group, Subgroup, Teacher, Classroom, Discipline, LessonType, ClassroomType
+from database.queries import publish_schedule
+from optimization.algorithms.problem import load_problem
+from optimization.algorithms.greedy import greedy_assignment
+from optimization.algorithms.fitness import get_evaluator, decode_schedule, FitnessCache, GENETIC_PENALTIES, HARD_PENALTIES
+from optimization.algorithms.workers import init_pool_worker, pool_problem, pool_evaluator
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 creator.create("FitnessMin", base.Fitness, weights=(-1.0,))
-creator.create("Individual", list, fitness=creator.FitnessMin)
+# Хромосома — масив (заняття × [слот, викладач, аудиторія]); заняття визначається позицією в problem.lessons
+creator.create("Individual", np.ndarray, fitness=creator.FitnessMin)
 
 
-def load_data():
-    logger.info("Завантаження даних із бази...")
-    session = Session()
-    try:
-        groups = session.query(Group).all()
-        subgroups = session.query(Subgroup).all()
-        teachers = session.query(Teacher).all()
-        classrooms = session.query(Classroom).all()
-        disciplines = session.query(Discipline).all()
-
-        logger.info(
-            f"Знайдено: груп={len(groups)}, підгруп={len(subgroups)}, викладачів={len(teachers)}, аудиторій={len(classrooms)}, дисциплін={len(disciplines)}")
-
-        if not all([groups, subgroups, teachers, classrooms, disciplines]):
-            raise ValueError("Дані в базі неповні. Запустіть test_db.py.")
-
-        return {
-            "groups": groups,
-            "subgroups": subgroups,
-            "teacher_ids": [t.id for t in teachers],
-            "classroom_ids": [c.id for c in classrooms],
-            "discipline_ids": [d.id for d in disciplines],
-            "time_slots": [
-                "Понеділок 8:30-10:00", "Понеділок 10:00-11:30", "Понеділок 12:00-13:30", "Понеділок 13:30-15:00",
-                "Вівторок 8:30-10:00", "Вівторок 10:00-11:30", "Вівторок 12:00-13:30", "Вівторок 13:30-15:00",
-                "Середа 8:30-10:00", "Середа 10:00-11:30", "Середа 12:00-13:30", "Середа 13:30-15:00",
-                "Четвер 8:30-10:00", "Четвер 10:00-11:30", "Четвер 12:00-13:30", "Четвер 13:30-15:00",
-                "П'ятниця 8:30-10:00", "П'ятниця 10:00-11:30", "П'ятниця 12:00-13:30", "П'ятниця 13:30-15:00"
-            ],
-        }
-    finally:
-        session.close()
+def evaluate_schedule(individual, problem=None):
+    logger.debug("Оцінка розкладу...")
+    problem = problem or load_problem()
+    return get_evaluator(problem, GENETIC_PENALTIES).evaluate_assignment(individual),
 
 
-def evaluate_schedule(individual):
-    logger.info("Оцінка розкладу...")
-    conflicts = 0
-    session = Session()
-    try:
-        slots_by_time = {}
-        for slot in individual:
-            ts = slot["time_slot"]
-            if ts not in slots_by_time:
-                slots_by_time[ts] = []
-            slots_by_time[ts].append(slot)
-
-        group_slots = {}
-        subgroup_slots = {}
-        teacher_load = {}
-        group_day_counts = {g.id: {day: 0 for day in ["Понеділок", "Вівторок", "Середа", "Четвер", "П'ятниця"]} for g in
-                            load_data()["groups"]}
-        teacher_day_slots = {t.id: {day: [] for day in ["Понеділок", "Вівторок", "Середа", "Четвер", "П'ятниця"]} for t
-                             in session.query(Teacher).all()}
-
-        for ts, slots in slots_by_time.items():
-            for i, slot1 in enumerate(slots):
-                if slot1.get("group_id"):
-                    group_id = slot1["group_id"]
-                    if group_id not in group_slots:
-                        group_slots[group_id] = {}
-                    group_slots[group_id][ts] = group_slots[group_id].get(ts, 0) + 1
-                    if group_slots[group_id][ts] > 1:
-                        conflicts += 10
-                if slot1.get("subgroup_id"):
-                    subgroup_id = slot1["subgroup_id"]
-                    if subgroup_id not in subgroup_slots:
-                        subgroup_slots[subgroup_id] = {}
-                    subgroup_slots[subgroup_id][ts] = subgroup_slots[subgroup_id].get(ts, 0) + 1
-                    if subgroup_slots[subgroup_id][ts] > 1:
-                        conflicts += 10
-
-                for slot2 in slots[i + 1:]:
-                    if slot1["classroom_id"] == slot2["classroom_id"]:
-                        conflicts += 1
-                    if slot1["teacher_id"] == slot2["teacher_id"]:
-                        conflicts += 1
-                    if (
-                            slot1.get("subgroup_id") and slot2.get("subgroup_id")
-                            and slot1["subgroup_id"] != slot2["subgroup_id"]
-                    ):
-                        subgroup1 = session.query(Subgroup).filter_by(id=slot1["subgroup_id"]).first()
-                        subgroup2 = session.query(Subgroup).filter_by(id=slot2["subgroup_id"]).first()
-                        if subgroup1 and subgroup2 and subgroup1.group_id == subgroup2.group_id:
-                            conflicts += 1
-
-                teacher_id = slot1["teacher_id"]
-                teacher_load[teacher_id] = teacher_load.get(teacher_id, 0) + 1
-                teacher = get_teacher_by_id(teacher_id)
-                if teacher and teacher_load[teacher_id] > teacher.max_load:
-                    conflicts += (teacher_load[teacher_id] - teacher.max_load) * 10
-
-                if teacher:
-                    availability = json.loads(teacher.availability)
-                    day, time = ts.split(" ", 1)
-                    if day not in availability or time not in availability[day]:
-                        conflicts += 1
-
-                classroom = get_classroom_by_id(slot1["classroom_id"])
-                if classroom:
-                    student_count = slot1.get("subgroup_student_count", 0) if slot1.get("subgroup_id") else slot1.get(
-                        "group_student_count", 0)
-                    if slot1["lesson_type"] == LessonType.LAB.value:
-                        if classroom.type != ClassroomType.LAB or student_count > classroom.capacity / 2:
-                            conflicts += 5
-                    elif slot1["lesson_type"] == LessonType.LECTURE.value:
-                        if classroom.type != ClassroomType.LECTURE or student_count > classroom.capacity:
-                            conflicts += 5
-
-                if slot1.get("group_id"):
-                    day = ts.split(" ")[0]
-                    group_day_counts[slot1["group_id"]][day] += 1
-                teacher_day_slots[teacher_id][ts.split(" ")[0]].append(ts)
-
-                if slot1["lesson_type"] == LessonType.LECTURE.value and any(t in ts for t in ["12:00", "13:30"]):
-                    conflicts += 2
-
-            for group_id, counts in group_day_counts.items():
-                avg = sum(counts.values()) / len(counts)
-                for count in counts.values():
-                    if count > avg + 1:
-                        conflicts += (count - avg) * 5
-
-            for teacher_id, days in teacher_day_slots.items():
-                for day, slots in days.items():
-                    if len(slots) > 1:
-                        slot_indices = [load_data()["time_slots"].index(s) % 4 for s in slots]
-                        if max(slot_indices) - min(slot_indices) + 1 > len(slots):
-                            conflicts += 5
-
-        data = load_data()
-        group_lectures = {g.id: set() for g in data["groups"]}
-        subgroup_labs = {s.id: set() for s in data["subgroups"]}
-        for slot in individual:
-            if slot["group_id"]:
-                group_lectures[slot["group_id"]].add(slot["discipline_id"])
-            elif slot["subgroup_id"]:
-                subgroup_labs[slot["subgroup_id"]].add(slot["discipline_id"])
-
-        for group in data["groups"]:
-            missing_lectures = len(data["discipline_ids"]) - len(group_lectures.get(group.id, set()))
-            conflicts += missing_lectures * 10
-        for subgroup in data["subgroups"]:
-            missing_labs = len(data["discipline_ids"]) - len(subgroup_labs.get(subgroup.id, set()))
-            conflicts += missing_labs * 10
-    finally:
-        session.close()
-    return conflicts,
+# Імовірність перепризначення кожного гена при мутації
+MUTATION_INDPB = 0.05
 
+# Частка початкової популяції, побудована жадібним алгоритмом (без конфліктів)
+GREEDY_FRACTION = 0.1
 
-def generate_slot(data, group=None, subgroup=None, discipline_id=None, lesson_type=None):
-    if lesson_type == LessonType.LECTURE.value:
-        group_id = group.id
-        subgroup_id = None
-        student_count = group.student_count
-    else:
-        group_id = None
-        subgroup_id = subgroup.id
-        student_count = subgroup.student_count
+# Як часто (секунд) острівна модель перевіряє, чи живі острови, поки чекає на результати
+RESULT_POLL_INTERVAL = 1.0
 
-    teacher_ids = get_teachers_for_discipline(discipline_id)
-    teacher_id = random.choice(teacher_ids) if teacher_ids else random.choice(data["teacher_ids"])
+def _genes_in_worker(seed, greedy):
+    return generate_genes(pool_problem(), seed, greedy)
 
-    session = Session()
-    try:
-        suitable_classrooms = session.query(Classroom).filter(
-            Classroom.type == (ClassroomType.LECTURE if lesson_type == LessonType.LECTURE.value else ClassroomType.LAB),
-            Classroom.capacity >= student_count
-        ).all()
-        classroom_id = random.choice([c.id for c in suitable_classrooms]) if suitable_classrooms else random.choice(
-            data["classroom_ids"])
-    finally:
-        session.close()
 
-    time_slots = data["time_slots"]
-    if lesson_type == LessonType.LECTURE.value:
-        morning_slots = [ts for ts in time_slots if "8:30" in ts or "10:00" in ts]
-        time_slot = random.choice(morning_slots) if morning_slots else random.choice(time_slots)
-    else:
-        afternoon_slots = [ts for ts in time_slots if "12:00" in ts or "13:30" in ts]
-        time_slot = random.choice(afternoon_slots) if afternoon_slots else random.choice(time_slots)
-
-    return {
-        "group_id": group_id,
-        "subgroup_id": subgroup_id,
-        "teacher_id": teacher_id,
-        "classroom_id": classroom_id,
-        "discipline_id": discipline_id,
-        "lesson_type": lesson_type,
-        "time_slot": time_slot,
-        "group_student_count": student_count if group_id else 0,
-        "subgroup_student_count": student_count if subgroup_id else 0,
-    }
-
-
-def generate_individual():
-    logger.info("Генерація індивіда...")
-    data = load_data()
-    individual = creator.Individual()
-
-    for group in data["groups"]:
-        for discipline_id in data["discipline_ids"]:
-            lecture_slot = generate_slot(data, group=group, discipline_id=discipline_id,
-                                         lesson_type=LessonType.LECTURE.value)
-            individual.append(lecture_slot)
-
-        subgroups = [s for s in data["subgroups"] if s.group_id == group.id]
-        if len(subgroups) < 2:
-            logger.warning(f"Група {group.name} має менше 2 підгруп!")
-            continue
-        for subgroup in subgroups:
-            for discipline_id in data["discipline_ids"]:
-                lab_slot = generate_slot(data, subgroup=subgroup, discipline_id=discipline_id,
-                                         lesson_type=LessonType.LAB.value)
-                individual.append(lab_slot)
+def _evaluate_in_worker(individual):
+    return pool_evaluator().evaluate_assignment(individual),
+
 
-    logger.info(f"Згенеровано {len(individual)} занять")
-    return individual
+def _map_arrays(pool, func, individuals):
+    # Воркерам передаються звичайні масиви: серіалізація індивіда DEAP (через list рядків) у сотні разів повільніша
+    return pool.map(func, [np.asarray(ind) for ind in individuals])
+
+
+def generate_genes(problem, seed, greedy=False):
+    # Кожен індивід має власне зерно, тож популяція однакова при послідовній і паралельній побудові
+    rng = np.random.default_rng(seed)
+    genes = np.column_stack([
+        problem.lesson_slot_domain.sample(rng),
+        problem.lesson_teacher_domain.sample(rng),
+        problem.lesson_classroom_domain.sample(rng),
+    ]).astype(np.int32)
+    if greedy:
+        # Заняття, які жадібний алгоритм не розмістив, лишаються випадковими
+        for lesson_idx, placed in enumerate(greedy_assignment(problem, random.Random(seed))):
+            if placed is not None:
+                genes[lesson_idx] = placed
+    return genes
+
+
+def init_population(problem, n, greedy_fraction=GREEDY_FRACTION, pool=None):
+    logger.info("Генерація початкової популяції...")
+    n_greedy = round(n * greedy_fraction)
+    tasks = [(random.getrandbits(64), i < n_greedy) for i in range(n)]
+    if pool is not None:
+        genes = pool.starmap(_genes_in_worker, tasks)
+    else:
+        genes = [generate_genes(problem, seed, greedy) for seed, greedy in tasks]
+    logger.info(f"Згенеровано {n} індивідів, з них жадібних: {n_greedy}")
+    return [creator.Individual(g) for g in genes]
+
+
+def lesson_blocks(problem):
+    """Повертає для кожного заняття індекс групи (для лабораторних — групи підгрупи)."""
+    return np.array([
+        lesson.group if lesson.group >= 0 else problem.subgroup_group[lesson.subgroup]
+        for lesson in problem.lessons
+    ], dtype=np.int64)
+
+
+def cx_group_blocks(ind1, ind2, blocks, n_blocks):
+    # Рівномірне схрещування по групах: усі заняття групи і її підгруп переходять разом
+    swap = np.array([random.random() < 0.5 for _ in range(n_blocks)], dtype=bool)[blocks]
+    genes = ind1[swap].copy()
+    ind1[swap] = ind2[swap]
+    ind2[swap] = genes
+    return ind1, ind2
+
+
+def mut_reassign(individual, problem, indpb):
+    # Перепризначення слота, викладача або аудиторії гена в межах домену заняття
+    for i in range(len(individual)):
+        if random.random() < indpb:
+            change = random.randrange(3)
+            if change == 0:
+                individual[i, 0] = random.randrange(problem.n_slots)
+            elif change == 1:
+                individual[i, 1] = random.choice(problem.lesson_teachers[i])
+            else:
+                individual[i, 2] = random.choice(problem.lesson_classrooms[i])
+    return individual,
 
 
 toolbox = base.Toolbox()
-toolbox.register("individual", generate_individual)
-toolbox.register("population", tools.initRepeat, list, toolbox.individual)
-toolbox.register("evaluate", evaluate_schedule)
-toolbox.register("mate", tools.cxTwoPoint)
-toolbox.register("mutate", tools.mutShuffleIndexes, indpb=0.15)
 toolbox.register("select", tools.selTournament, tournsize=3)
 
 
-def run_genetic_algorithm():
+def _setup_toolbox(problem, pool, greedy_fraction):
+    blocks = lesson_blocks(problem)
+    toolbox.register("mate", cx_group_blocks, blocks=blocks, n_blocks=problem.n_groups)
+    toolbox.register("mutate", mut_reassign, problem=problem, indpb=MUTATION_INDPB)
+    if pool is not None:
+        toolbox.register("map", _map_arrays, pool)
+        toolbox.register("evaluate", _evaluate_in_worker)
+    else:
+        toolbox.register("map", map)
+        toolbox.register("evaluate", evaluate_schedule, problem=problem)
+    toolbox.register("population", init_population, problem, greedy_fraction=greedy_fraction, pool=pool)
+
+
+def run_genetic_algorithm(problem=None, workers=1, cache_size=10000, greedy_fraction=GREEDY_FRACTION):
     logger.info("Запуск генетичного алгоритму...")
-    population = toolbox.population(n=100)
+    problem = problem or load_problem()
+    started = time.perf_counter()
+
+    # workers > 1 — оцінка фітнесу в пулі процесів
+    pool = None
+    if workers > 1:
+        # Дані задачі передаються воркерам один раз, а не з кожним індивідом
+        pool = multiprocessing.Pool(workers, initializer=init_pool_worker, initargs=(problem, GENETIC_PENALTIES))
+        logger.info(f"Оцінка фітнесу в {workers} процесах")
+    _setup_toolbox(problem, pool, greedy_fraction)
+    try:
+        best = _evolve(FitnessCache(cache_size))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    # У формат словників розклад переводиться лише для збереження і відображення
+    fitness = best.fitness.values[0]
+    best = decode_schedule(get_evaluator(problem, GENETIC_PENALTIES).encode_assignment(best), problem)
+    params = dict(workers=workers, cache_size=cache_size, greedy_fraction=greedy_fraction)
+    _save_best(best, "genetic", params, fitness, time.perf_counter() - started)
+    return best
+
+
+def run_island_model(problem=None, islands=4, migration_interval=10, migration_size=2, topology="ring",
+                     time_budget=None, generations=100, greedy_fraction=GREEDY_FRACTION):
+    """Острівна модель: кожна субпопуляція еволюціонує в окремому процесі з періодичною міграцією найкращих.
+
+    topology — "ring" (до сусіднього острова) або "random" (до випадкового). Усі острови
+    зупиняються, щойно один знайде розклад без жорстких конфліктів або сплине time_budget секунд.
+    """
+    logger.info(f"Запуск острівної моделі: островів {islands}, міграція кожні {migration_interval} поколінь")
+    problem = problem or load_problem()
+    if topology not in ("ring", "random"):
+        raise ValueError(f"Невідома топологія міграції: {topology}")
+    started = time.perf_counter()
+
+    deadline = time.time() + time_budget if time_budget else None
+    inboxes = [multiprocessing.Queue() for _ in range(islands)]
+    stop = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    processes = []
+    for index in range(islands):
+        if topology == "ring":
+            outboxes = [inboxes[(index + 1) % islands]]
+        else:
+            outboxes = [inbox for other, inbox in enumerate(inboxes) if other != index] or [inboxes[index]]
+        migration = (inboxes[index], outboxes, migration_interval, migration_size)
+        process = multiprocessing.Process(
+            target=_run_island,
+            args=(index, problem, random.getrandbits(64), greedy_fraction, generations, migration, stop, deadline, results),
+        )
+        process.start()
+        processes.append(process)
+
+    try:
+        island_results = _collect_island_results(processes, results)
+    except BaseException:
+        # Без результату одного острова модель не завершиться: зупиняємо решту
+        stop.set()
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        raise
+    finally:
+        for process in processes:
+            process.join()
+
+    index, genes, fitness = min(island_results, key=lambda result: result[2])
+    logger.info(f"Найкращий розклад з острова {index}, фітнес: {fitness}")
+    best = decode_schedule(get_evaluator(problem, GENETIC_PENALTIES).encode_assignment(genes), problem)
+    params = dict(islands=islands, migration_interval=migration_interval, migration_size=migration_size,
+                  topology=topology, time_budget=time_budget, generations=generations, greedy_fraction=greedy_fraction)
+    _save_best(best, "island_model", params, fitness, time.perf_counter() - started)
+    return best
+
+
+def _collect_island_results(processes, results):
+    """Чекає на результат кожного острова; RuntimeError, якщо острів впав або завершився без результату."""
+    collected = {}
+    while len(collected) < len(processes):
+        try:
+            result = results.get(timeout=RESULT_POLL_INTERVAL)
+        except queue.Empty:
+            for index, process in enumerate(processes):
+                if index not in collected and process.exitcode not in (None, 0):
+                    raise RuntimeError(f"Острів {index} завершився аварійно (код {process.exitcode})")
+            continue
+        if len(result) == 2:
+            index, error = result
+            raise RuntimeError(f"Помилка на острові {index}: {error}")
+        collected[result[0]] = result
+    return list(collected.values())
 
-    for ind in population:
-        ind.fitness.values = evaluate_schedule(ind)
+
+def _run_island(index, problem, seed, greedy_fraction, generations, migration, stop, deadline, results):
+    """Еволюція одного острова; результат (індекс, гени, фітнес) або (індекс, помилка) завжди потрапляє в results."""
+    try:
+        results.put(_evolve_island(index, problem, seed, greedy_fraction, generations, migration, stop, deadline))
+    except Exception as e:
+        logger.exception(f"Острів {index}: помилка")
+        results.put((index, f"{type(e).__name__}: {e}"))
+
+
+def _evolve_island(index, problem, seed, greedy_fraction, generations, migration, stop, deadline):
+    random.seed(seed)
+    _setup_toolbox(problem, None, greedy_fraction)
+    hard = get_evaluator(problem, HARD_PENALTIES)
+    inbox, outboxes, interval, size = migration
+    for outbox in outboxes:
+        # Не чекати на доставку мігрантів при виході: острів-отримувач міг уже завершитися
+        outbox.cancel_join_thread()
+
+    def on_generation(gen, population):
+        if (gen + 1) % interval == 0:
+            for ind in tools.selBest(population, size):
+                random.choice(outboxes).put((np.asarray(ind), ind.fitness.values))
+            _receive_migrants(population, inbox)
+        if hard.evaluate_assignment(tools.selBest(population, 1)[0]) == 0:
+            logger.info(f"Острів {index}: знайдено розклад без конфліктів")
+            stop.set()
+        if deadline is not None and time.time() >= deadline:
+            stop.set()
+        return stop.is_set()
+
+    best = _evolve(FitnessCache(), generations, on_generation)
+    return index, np.asarray(best), best.fitness.values[0]
+
+
+def _receive_migrants(population, inbox):
+    # Мігранти заміщують найгірших індивідів острова
+    migrants = []
+    while True:
+        try:
+            genes, fitness = inbox.get_nowait()
+        except queue.Empty:
+            break
+        migrant = creator.Individual(genes)
+        migrant.fitness.values = fitness
+        migrants.append(migrant)
+    worst = sorted(range(len(population)), key=lambda i: population[i].fitness)[:len(migrants)]
+    for i, migrant in zip(worst, migrants):
+        population[i] = migrant
+
+
+def _evaluate(individuals, cache):
+    # Оцінюються лише геноми, яких немає в кеші; однакові в межах покоління — один раз
+    pending = {}
+    for ind in individuals:
+        key = cache.key(ind)
+        if key in pending:
+            pending[key].append(ind)
+            cache.hits += 1
+            continue
+        fit = cache.get(key)
+        if fit is not None:
+            ind.fitness.values = fit
+        else:
+            pending[key] = [ind]
+    fits = toolbox.map(toolbox.evaluate, [same[0] for same in pending.values()])
+    for (key, same), fit in zip(pending.items(), fits):
+        cache.put(key, fit)
+        for ind in same:
+            ind.fitness.values = fit
+
+
+def _evolve(cache, generations=100, on_generation=None):
+    population = toolbox.population(n=100)
+    _evaluate(population, cache)
 
     best_fitness = float("inf")
     no_improvement = 0
-    for gen in range(100):
-        logger.info(f"Покоління {gen + 1}/100")
+    for gen in range(generations):
+        logger.info(f"Покоління {gen + 1}/{generations}")
 
         offspring = toolbox.select(population, len(population))
         offspring = list(map(toolbox.clone, offspring))
@@ -270,9 +316,9 @@ def run_genetic_algorithm():
                 del mutant.fitness.values
 
         invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
-        fits = toolbox.map(toolbox.evaluate, invalid_ind)
-        for ind, fit in zip(invalid_ind, fits):
-            ind.fitness.values = fit
+        cache.reset_stats()
+        _evaluate(invalid_ind, cache)
+        logger.info(f"Кеш фітнесу: влучань {cache.hits}, промахів {cache.misses}")
 
         population[:] = offspring
 
@@ -285,25 +331,15 @@ def run_genetic_algorithm():
         if no_improvement >= 20:
             logger.info("Зупинка: немає покращення фітнесу")
             break
+        if on_generation is not None and on_generation(gen, population):
+            break
 
-    best = tools.selBest(population, k=1)[0]
+    return tools.selBest(population, k=1)[0]
 
-    session = Session()
-    try:
-        for slot in best:
-            add_schedule(
-                group_id=slot.get("group_id"),
-                subgroup_id=slot.get("subgroup_id"),
-                teacher_id=slot["teacher_id"],
-                classroom_id=slot["classroom_id"],
-                discipline_id=slot["discipline_id"],
-                lesson_type=slot["lesson_type"],
-                time_slot=slot["time_slot"]
-            )
-        session.commit()
-        logger.info("Розклад збережено в базу даних")
-    finally:
-        session.close()
+
+def _save_best(best, algorithm, params, fitness, duration):
+    publish_schedule(best, algorithm, params, fitness, duration)
+    logger.info("Розклад збережено в базу даних")
 
     kn21_count = sum(1 for slot in best if slot.get("group_id") == 1 or slot.get("subgroup_id") in [1, 2])
     logger.info(f"Занять для КН-21: {kn21_count}")
@@ -315,8 +351,6 @@ def run_genetic_algorithm():
         if time_slots[key] > 1:
             logger.warning(f"Конфлікт: {key} має {time_slots[key]} занять")
 
-    return best
-
 
 if __name__ == "__main__":
     try:
@@ -1,218 +1,292 @@
+import heapq
+import time
 import random
-import json
 import logging
-from database.queries import (
-    get_all_groups, get_all_subgroups, get_all_teachers, get_all_classrooms,
-    get_all_disciplines, get_teachers_for_discipline, get_classrooms_by_type,
-    get_teacher_by_id, get_group_by_id, get_subgroup_by_id, get_classroom_by_id,
-    add_schedule, Session
-)
-from database.models import (
-    LessonType, ClassroomType, Teacher, Classroom, Group, Subgroup, Discipline
-)
+import weakref
+from database.queries import publish_schedule
+from optimization.algorithms.problem import load_problem
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def load_data():
-    """Завантажує дані з бази для генерації розкладу."""
-    logger.info("Завантаження даних із бази...")
-    session = Session()
-    try:
-        groups = session.query(Group).all()
-        subgroups = session.query(Subgroup).all()
-        teachers = session.query(Teacher).all()
-        classrooms = session.query(Classroom).all()
-        disciplines = session.query(Discipline).all()
-
-        logger.info(
-            f"Знайдено: груп={len(groups)}, підгруп={len(subgroups)}, викладачів={len(teachers)}, "
-            f"аудиторій={len(classrooms)}, дисциплін={len(disciplines)}"
-        )
-
-        if not all([groups, subgroups, teachers, classrooms, disciplines]):
-            raise ValueError("Дані в базі неповні. Запустіть test_db.py.")
-
-        return {
-            "groups": groups,
-            "subgroups": subgroups,
-            "teacher_ids": [t.id for t in teachers],
-            "classroom_ids": [c.id for c in classrooms],
-            "discipline_ids": [d.id for d in disciplines],
-            "time_slots": [
-                "Понеділок 8:30-10:00", "Понеділок 10:00-11:30", "Понеділок 12:00-13:30", "Понеділок 13:30-15:00",
-                "Вівторок 8:30-10:00", "Вівторок 10:00-11:30", "Вівторок 12:00-13:30", "Вівторок 13:30-15:00",
-                "Середа 8:30-10:00", "Середа 10:00-11:30", "Середа 12:00-13:30", "Середа 13:30-15:00",
-                "Четвер 8:30-10:00", "Четвер 10:00-11:30", "Четвер 12:00-13:30", "Четвер 13:30-15:00",
-                "П'ятниця 8:30-10:00", "П'ятниця 10:00-11:30", "П'ятниця 12:00-13:30", "П'ятниця 13:30-15:00"
-            ],
-        }
-    finally:
-        session.close()
-
-def is_slot_valid(schedule, group_id, subgroup_id, teacher_id, classroom_id, time_slot, data):
-    """Перевіряє, чи можна призначити заняття у вказаний слот без конфліктів."""
-    # Перевірка зайнятості групи
-    if group_id:
-        for slot in schedule:
-            if slot["time_slot"] == time_slot and slot.get("group_id") == group_id:
-                return False
-            # Перевірка, чи підгрупи групи не зайняті (для лекцій)
-            if slot["time_slot"] == time_slot and slot.get("subgroup_id"):
-                subgroup = get_subgroup_by_id(slot["subgroup_id"])
-                if subgroup and subgroup.group_id == group_id:
-                    return False
-
-    # Перевірка зайнятості підгрупи
-    if subgroup_id:
-        for slot in schedule:
-            if slot["time_slot"] == time_slot and slot.get("subgroup_id") == subgroup_id:
-                return False
-            # Перевірка, чи група підгрупи не зайнята лекцією
-            if slot["time_slot"] == time_slot and slot.get("group_id"):
-                subgroup = get_subgroup_by_id(subgroup_id)
-                if subgroup and subgroup.group_id == slot["group_id"]:
-                    return False
-
-    # Перевірка зайнятості викладача
-    for slot in schedule:
-        if slot["time_slot"] == time_slot and slot["teacher_id"] == teacher_id:
-            return False
+class Occupancy:
+    """Зайнятість часових слотів: бітова маска слотів для кожного викладача, аудиторії, групи і підгрупи."""
 
-    # Перевірка зайнятості аудиторії
-    for slot in schedule:
-        if slot["time_slot"] == time_slot and slot["classroom_id"] == classroom_id:
-            return False
-
-    # Перевірка доступності викладача
-    teacher = get_teacher_by_id(teacher_id)
-    if teacher:
-        availability = json.loads(teacher.availability)
-        day, time = time_slot.split(" ", 1)
-        if time not in availability.get(day, []):
-            return False
-
-    return True
-
-def generate_slot(data, group=None, subgroup=None, discipline_id=None, lesson_type=None, schedule=None):
-    """Генерує одне заняття, вибираючи найменш завантажений слот."""
-    if lesson_type == LessonType.LECTURE.value:
-        group_id = group.id if group else None
-        subgroup_id = None
-        student_count = group.student_count if group else 0
-    else:
-        group_id = None
-        subgroup_id = subgroup.id if subgroup else None
-        student_count = subgroup.student_count if subgroup else 0
-
-    # Вибираємо викладача
-    teacher_ids = get_teachers_for_discipline(discipline_id)
-    if not teacher_ids:
-        teacher_ids = data["teacher_ids"]
-    random.shuffle(teacher_ids)  # Перемішуємо для різноманітності
-
-    # Вибираємо аудиторію
-    suitable_classrooms = get_classrooms_by_type(
-        ClassroomType.LECTURE if lesson_type == LessonType.LECTURE.value else ClassroomType.LAB
+    def __init__(self, problem):
+        self.problem = problem
+        self.teachers = [0] * problem.n_teachers
+        self.classrooms = [0] * problem.n_classrooms
+        self.groups = [0] * problem.n_groups
+        # Слоти, де лабораторну має хоча б одна підгрупа групи
+        self.group_labs = [0] * problem.n_groups
+        self.subgroups = [0] * problem.n_subgroups
+        self.slot_load = [0] * problem.n_slots
+
+    def place(self, lesson, teacher, classroom, slot):
+        """Позначає слот зайнятим для викладача, аудиторії та групи або підгрупи заняття."""
+        bit = 1 << slot
+        self.teachers[teacher] |= bit
+        self.classrooms[classroom] |= bit
+        if lesson.group >= 0:
+            self.groups[lesson.group] |= bit
+        if lesson.subgroup >= 0:
+            self.subgroups[lesson.subgroup] |= bit
+            parent = self.problem.subgroup_group[lesson.subgroup]
+            if parent >= 0:
+                self.group_labs[parent] |= bit
+        self.slot_load[slot] += 1
+
+    def remove(self, lesson, teacher, classroom, slot):
+        """Звільняє слот, зайнятий заняттям (обернена до place)."""
+        bit = 1 << slot
+        self.teachers[teacher] &= ~bit
+        self.classrooms[classroom] &= ~bit
+        if lesson.group >= 0:
+            self.groups[lesson.group] &= ~bit
+        if lesson.subgroup >= 0:
+            self.subgroups[lesson.subgroup] &= ~bit
+            parent = self.problem.subgroup_group[lesson.subgroup]
+            if parent >= 0:
+                # Слот лишається зайнятим, якщо в ньому є лабораторна іншої підгрупи
+                labs = 0
+                for subgroup in self.problem.group_subgroups(parent):
+                    labs |= self.subgroups[subgroup]
+                self.group_labs[parent] = labs
+        self.slot_load[slot] -= 1
+
+    def busy_slots(self, lesson):
+        """Маска слотів, де група (разом із лабораторними підгруп) або підгрупа заняття вже зайняті."""
+        if lesson.group >= 0:
+            return self.groups[lesson.group] | self.group_labs[lesson.group]
+        mask = self.subgroups[lesson.subgroup]
+        parent = self.problem.subgroup_group[lesson.subgroup]
+        if parent >= 0:
+            mask |= self.groups[parent]
+        return mask
+
+def _domain_classes(domains):
+    """Об'єднує заняття з однаковим доменом: повертає клас кожного заняття і перелік значень кожного класу."""
+    index = {}
+    lesson_class = [index.setdefault(tuple(domain.tolist()), len(index)) for domain in domains]
+    return lesson_class, list(index)
+
+def _inverse(members, size):
+    """Для кожного значення 0..size-1 повертає індекси списків members, що його містять."""
+    owners = [[] for _ in range(size)]
+    for idx, values in enumerate(members):
+        for value in values:
+            owners[value].append(idx)
+    return owners
+
+_structures = weakref.WeakKeyDictionary()
+
+def _domain_structure(problem):
+    """Класи викладачів і аудиторій та групування занять за групами; кешується на час життя problem."""
+    if problem in _structures:
+        return _structures[problem]
+    teacher_class, teacher_classes = _domain_classes(problem.lesson_teachers)
+    classroom_class, classroom_classes = _domain_classes(problem.lesson_classrooms)
+    # Заняття, що конфліктують за часом: група разом з усіма своїми підгрупами
+    block = [
+        lesson.group if lesson.group >= 0
+        else problem.subgroup_group[lesson.subgroup] if problem.subgroup_group[lesson.subgroup] >= 0
+        else problem.n_groups + lesson.subgroup
+        for lesson in problem.lessons
+    ]
+    structure = (
+        teacher_class, teacher_classes, classroom_class, classroom_classes,
+        _inverse(teacher_classes, problem.n_teachers),
+        _inverse(classroom_classes, problem.n_classrooms),
+        _inverse([(c,) for c in teacher_class], len(teacher_classes)),
+        _inverse([(c,) for c in classroom_class], len(classroom_classes)),
+        block,
+        _inverse([(b,) for b in block], problem.n_groups + problem.n_subgroups),
     )
-    suitable_classrooms = [c for c in suitable_classrooms if c.capacity >= student_count]
-    classroom_ids = [c.id for c in suitable_classrooms] if suitable_classrooms else data["classroom_ids"]
-    random.shuffle(classroom_ids)
+    _structures[problem] = structure
+    return structure
 
-    # Рахуємо завантаженість часових слотів
-    slot_load = {ts: 0 for ts in data["time_slots"]}
-    for slot in schedule:
-        slot_load[slot["time_slot"]] += 1
-
-    # Сортуємо слоти за завантаженістю (менше занять — краще)
-    sorted_slots = sorted(slot_load.items(), key=lambda x: x[1])
-
-    # Пробуємо призначити заняття
-    for time_slot, _ in sorted_slots:
-        for teacher_id in teacher_ids:
-            for classroom_id in classroom_ids:
-                if is_slot_valid(schedule, group_id, subgroup_id, teacher_id, classroom_id, time_slot, data):
-                    return {
-                        "group_id": group_id,
-                        "subgroup_id": subgroup_id,
-                        "teacher_id": teacher_id,
-                        "classroom_id": classroom_id,
-                        "discipline_id": discipline_id,
-                        "lesson_type": lesson_type,
-                        "time_slot": time_slot,
-                        "group_student_count": student_count if group_id else 0,
-                        "subgroup_student_count": student_count if subgroup_id else 0,
-                    }
-    logger.warning(f"Не вдалося знайти вільний слот для дисципліни {discipline_id}")
-    return None
-
-def run_greedy_algorithm():
+class SlotDomains:
+    """Домени занять для DSatur: бітова маска слотів, де заняття ще можна розмістити без конфліктів.
+
+    Заняття з однаковим переліком викладачів (аудиторій) належать до одного класу, і для класу
+    зберігається об'єднання масок вільних слотів його викладачів (аудиторій). Домен заняття —
+    вільні слоти його групи чи підгрупи, перетнуті з масками двох його класів.
+    """
+
+    def __init__(self, problem, occupancy):
+        self.problem = problem
+        self.occupancy = occupancy
+        self.full = (1 << problem.n_slots) - 1
+        self.teacher_free = [mask & self.full for mask in problem.teacher_slot_masks]
+        self.classroom_free = [self.full] * problem.n_classrooms
+
+        (self.teacher_class, self.teacher_classes, self.classroom_class, self.classroom_classes,
+         self.classes_of_teacher, self.classes_of_classroom, self.teacher_class_lessons,
+         self.classroom_class_lessons, self.block, self.block_lessons) = _domain_structure(problem)
+        self.teacher_union = [self._union(self.teacher_free, members) for members in self.teacher_classes]
+        self.classroom_union = [self._union(self.classroom_free, members) for members in self.classroom_classes]
+
+    @staticmethod
+    def _union(free, members):
+        mask = 0
+        for member in members:
+            mask |= free[member]
+        return mask
+
+    def domain(self, lesson_idx):
+        """Маска слотів, де вільні група (підгрупа), хоча б один викладач і хоча б одна аудиторія заняття."""
+        busy = self.occupancy.busy_slots(self.problem.lessons[lesson_idx])
+        return (~busy & self.teacher_union[self.teacher_class[lesson_idx]]
+                & self.classroom_union[self.classroom_class[lesson_idx]] & self.full)
+
+    def choose(self, lesson_idx, domain, rng=random):
+        """Вибирає найменш завантажений слот домену і вільних у ньому викладача та аудиторію."""
+        slots = [slot for slot in range(self.problem.n_slots) if domain >> slot & 1]
+        return self.candidate(lesson_idx, min(slots, key=self.occupancy.slot_load.__getitem__), rng)
+
+    def candidates(self, lesson_idx, domain, rng=random):
+        """По одному розміщенню (слот, викладач, аудиторія) на кожен слот домену."""
+        return [self.candidate(lesson_idx, slot, rng) for slot in range(self.problem.n_slots) if domain >> slot & 1]
+
+    def candidate(self, lesson_idx, slot, rng=random):
+        """Розміщення в слоті з випадковими вільними в ньому викладачем і аудиторією."""
+        teacher = rng.choice([t for t in self.teacher_classes[self.teacher_class[lesson_idx]]
+                              if self.teacher_free[t] >> slot & 1])
+        classroom = rng.choice([c for c in self.classroom_classes[self.classroom_class[lesson_idx]]
+                                if self.classroom_free[c] >> slot & 1])
+        return slot, teacher, classroom
+
+    def place(self, lesson_idx, slot, teacher, classroom):
+        """Розміщує заняття і повертає заняття, чиї домени могли змінитися."""
+        self.occupancy.place(self.problem.lessons[lesson_idx], teacher, classroom, slot)
+        bit = 1 << slot
+        self.teacher_free[teacher] &= ~bit
+        self.classroom_free[classroom] &= ~bit
+        return self._refresh(lesson_idx, teacher, classroom)
+
+    def remove(self, lesson_idx, slot, teacher, classroom):
+        """Знімає заняття з розкладу і повертає заняття, чиї домени могли змінитися."""
+        self.occupancy.remove(self.problem.lessons[lesson_idx], teacher, classroom, slot)
+        bit = 1 << slot
+        self.teacher_free[teacher] |= bit
+        self.classroom_free[classroom] |= bit
+        return self._refresh(lesson_idx, teacher, classroom)
+
+    def fill(self, placements):
+        """Розміщує багато занять (заняття, слот, викладач, аудиторія) одразу, без відстеження змінених доменів."""
+        lessons = self.problem.lessons
+        for lesson_idx, slot, teacher, classroom in placements:
+            self.occupancy.place(lessons[lesson_idx], teacher, classroom, slot)
+            bit = 1 << slot
+            self.teacher_free[teacher] &= ~bit
+            self.classroom_free[classroom] &= ~bit
+        self.teacher_union = [self._union(self.teacher_free, members) for members in self.teacher_classes]
+        self.classroom_union = [self._union(self.classroom_free, members) for members in self.classroom_classes]
+
+    def _refresh(self, lesson_idx, teacher, classroom):
+        affected = list(self.block_lessons[self.block[lesson_idx]])
+        # Маска класу змінюється, лише коли в слоті не лишилося (або з'явився) вільний викладач (аудиторія) класу
+        for cls in self.classes_of_teacher[teacher]:
+            union = self._union(self.teacher_free, self.teacher_classes[cls])
+            if union != self.teacher_union[cls]:
+                self.teacher_union[cls] = union
+                affected.extend(self.teacher_class_lessons[cls])
+        for cls in self.classes_of_classroom[classroom]:
+            union = self._union(self.classroom_free, self.classroom_classes[cls])
+            if union != self.classroom_union[cls]:
+                self.classroom_union[cls] = union
+                affected.extend(self.classroom_class_lessons[cls])
+        return affected
+
+def popcount(mask):
+    return bin(mask).count("1")
+
+def greedy_assignment(problem, rng=random, lessons=None, fixed=(), choose=None):
+    """Будує розклад без конфліктів у порядку DSatur; повертає (слот, викладач, аудиторія) або None для кожного заняття.
+
+    Наступним розміщується заняття з найменшим доменом (за рівності — з меншою кількістю
+    викладачів); після розміщення домени перераховуються лише для занять, яких воно зачепило.
+    Якщо задано lessons, розміщуються лише ці заняття (для решти повертається None), а
+    fixed — вже розміщені заняття (заняття, слот, викладач, аудиторія), що лише займають ресурси.
+    choose(заняття, варіанти) замість найменш завантаженого слоту вибирає розміщення з варіантів
+    для кожного слоту домену.
+    """
+    occupancy = Occupancy(problem)
+    domains = SlotDomains(problem, occupancy)
+    n_lessons = len(problem.lessons)
+    domains.fill(fixed)
+    lessons = range(n_lessons) if lessons is None else lessons
+    assignment = [None] * n_lessons
+    placed = [True] * n_lessons
+    current = [0] * n_lessons
+    for lesson_idx in lessons:
+        placed[lesson_idx] = False
+        current[lesson_idx] = domains.domain(lesson_idx)
+
+    # Черга з лінивим видаленням: запис застарів, якщо домен заняття відтоді змінився
+    def entry(lesson_idx):
+        return (popcount(current[lesson_idx]), len(domains.teacher_classes[domains.teacher_class[lesson_idx]]),
+                rng.random(), lesson_idx, current[lesson_idx])
+
+    queue = [entry(lesson_idx) for lesson_idx in lessons]
+    heapq.heapify(queue)
+    while queue:
+        _, _, _, lesson_idx, domain = heapq.heappop(queue)
+        if placed[lesson_idx] or domain != current[lesson_idx]:
+            continue
+        placed[lesson_idx] = True
+        if not domain:
+            continue
+        if choose is None:
+            assignment[lesson_idx] = domains.choose(lesson_idx, domain, rng)
+        else:
+            assignment[lesson_idx] = choose(lesson_idx, domains.candidates(lesson_idx, domain, rng))
+        for neighbour in set(domains.place(lesson_idx, *assignment[lesson_idx])):
+            if placed[neighbour]:
+                continue
+            domain = domains.domain(neighbour)
+            if domain != current[neighbour]:
+                current[neighbour] = domain
+                heapq.heappush(queue, entry(neighbour))
+    return assignment
+
+def run_greedy_algorithm(problem=None):
     """Запускає жадібний алгоритм для створення розкладу."""
     logger.info("Запуск жадібного алгоритму...")
-    data = load_data()
+    problem = problem or load_problem()
+    started = time.perf_counter()
     schedule = []
 
-    # Лекції для груп
-    for group in data["groups"]:
-        for discipline_id in data["discipline_ids"]:
-            slot = generate_slot(
-                data, group=group, discipline_id=discipline_id,
-                lesson_type=LessonType.LECTURE.value, schedule=schedule
-            )
-            if slot:
-                schedule.append(slot)
-            else:
-                logger.warning(f"Пропущено лекцію для групи {group.name}, дисципліна {discipline_id}")
-
-    # Лабораторні для підгруп
-    for group in data["groups"]:
-        subgroups = [s for s in data["subgroups"] if s.group_id == group.id]
-        if len(subgroups) < 2:
-            logger.warning(f"Група {group.name} має менше 2 підгруп!")
-            continue
-        for subgroup in subgroups:
-            for discipline_id in data["discipline_ids"]:
-                slot = generate_slot(
-                    data, subgroup=subgroup, discipline_id=discipline_id,
-                    lesson_type=LessonType.LAB.value, schedule=schedule
-                )
-                if slot:
-                    schedule.append(slot)
-                else:
-                    logger.warning(f"Пропущено лабораторну для підгрупи {subgroup.name}, дисципліна {discipline_id}")
+    # Заняття розміщуються в порядку DSatur; ті, для яких не лишилося вільного слоту, пропускаються
+    for lesson_idx, placed in enumerate(greedy_assignment(problem)):
+        lesson = problem.lessons[lesson_idx]
+        if placed is not None:
+            schedule.append(problem.make_slot(lesson, *placed))
+        elif lesson.group >= 0:
+            logger.warning(f"Пропущено лекцію для групи {problem.group_names[lesson.group]}, "
+                           f"дисципліна {problem.discipline_ids[lesson.discipline]}")
+        else:
+            logger.warning(f"Пропущено лабораторну для підгрупи {problem.subgroup_names[lesson.subgroup]}, "
+                           f"дисципліна {problem.discipline_ids[lesson.discipline]}")
 
     # Збереження розкладу в базу
-    session = Session()
     try:
-        for slot in schedule:
-            add_schedule(
-                group_id=slot.get("group_id"),
-                subgroup_id=slot.get("subgroup_id"),
-                teacher_id=slot["teacher_id"],
-                classroom_id=slot["classroom_id"],
-                discipline_id=slot["discipline_id"],
-                lesson_type=slot["lesson_type"],
-                time_slot=slot["time_slot"]
-            )
-        session.commit()
+        publish_schedule(schedule, "greedy", duration=time.perf_counter() - started)
         logger.info("Розклад збережено в базу даних")
     except Exception as e:
-        session.rollback()
         logger.error(f"Помилка збереження розкладу: {e}")
-    finally:
-        session.close()
 
     # Логування результатів
     kn21_count = sum(1 for slot in schedule if slot.get("group_id") and
-                     get_group_by_id(slot["group_id"]).name == "КН-21")
+                     problem.slot_owner_name(slot) == "КН-21")
     logger.info(f"Оптимізація завершена. Занять: {len(schedule)}")
     logger.info(f"Занять для КН-21: {kn21_count}")
 
     # Дебаг-вивід розкладу
     logger.info("Фінальний розклад:")
     for slot in schedule:
-        group = get_group_by_id(slot["group_id"]).name if slot["group_id"] else "-"
-        subgroup = get_subgroup_by_id(slot["subgroup_id"]).name if slot["subgroup_id"] else "-"
+        group = problem.slot_owner_name(slot) if slot["group_id"] else "-"
+        subgroup = problem.slot_owner_name(slot) if slot["subgroup_id"] else "-"
         logger.info(f"Група: {group}, Підгрупа: {subgroup}, Час: {slot['time_slot']}, Тип: {slot['lesson_type']}")
 
     return schedule
@@ -222,4 +296,4 @@ if __name__ == "__main__":
         schedule = run_greedy_algorithm()
         logger.info("Розклад згенеровано")
     except Exception as e:
-        logger.error(f"Помилка: {e}")
\ No newline at end of file
+        logger.error(f"Помилка: {e}")
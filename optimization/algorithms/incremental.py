@@ -0,0 +1,402 @@
+import random
+from itertools import chain
+import numpy as np
+from optimization.algorithms.problem import DAYS, LECTURE, LAB
+from optimization.algorithms.fitness import get_evaluator, day_imbalance, teacher_gaps
+
+
+class IndexedSet:
+    """Множина з додаванням, видаленням і випадковим вибором елемента за O(1)."""
+
+    def __init__(self, items=()):
+        self._items = []
+        self._position = {}
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, item):
+        return item in self._position
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def add(self, item):
+        if item not in self._position:
+            self._position[item] = len(self._items)
+            self._items.append(item)
+
+    def discard(self, item):
+        position = self._position.pop(item, None)
+        if position is None:
+            return
+        last = self._items.pop()
+        if position < len(self._items):
+            self._items[position] = last
+            self._position[last] = position
+
+    def choice(self, rng=random):
+        return self._items[rng.randrange(len(self._items))]
+
+
+class IncrementalEvaluator:
+    """Інкрементна оцінка розкладу для локального пошуку.
+
+    Тримає лічильники зайнятості (слот, викладач), (слот, аудиторія),
+    (слот, група), (слот, підгрупа), навантаження викладачів і лекції груп
+    по слотах, тож зміна слота, викладача чи аудиторії одного заняття
+    перераховується за O(1). Штрафи за рівномірність і «вікна» залежать від
+    порядку першої появи слотів, тому кешуються по групах і викладачах і
+    перераховуються лише для зачеплених сутностей (або всіх, якщо порядок
+    змінився). Значення score завжди збігається з FitnessEvaluator.
+
+    Також підтримується множина conflicts — заняття з жорсткими конфліктами
+    (накладка викладача, аудиторії, групи, підгрупи, лекції з лабораторною
+    своєї групи або заняття поза доступністю викладача).
+    """
+
+    def __init__(self, problem, penalties, enc):
+        self.problem = problem
+        self.penalties = penalties
+        self.n_lessons = len(enc.slot)
+        n_slots = problem.n_slots
+        self._n_teachers = problem.n_teachers
+        self._n_classrooms = problem.n_classrooms
+        self._n_groups = problem.n_groups
+        self._n_subgroups = problem.n_subgroups
+
+        # Скалярний доступ до списків Python значно швидший, ніж до масивів NumPy
+        self.slot = enc.slot.tolist()
+        self.teacher = enc.teacher.tolist()
+        self.classroom = enc.classroom.tolist()
+        self._enc = enc
+        self.group = enc.group.tolist()
+        self.subgroup = enc.subgroup.tolist()
+        self.parent = np.where(enc.subgroup >= 0, problem.subgroup_group[np.maximum(enc.subgroup, 0)], -1).tolist()
+        self._lecture = (enc.lesson_type == LECTURE).tolist()
+        self._available = problem.teacher_available.ravel().tolist()
+        self._max_load = problem.teacher_max_load.tolist()
+        self._slot_day = problem.slot_day.tolist()
+        self._slot_period = problem.slot_period.tolist()
+        self._afternoon = (problem.slot_period >= 2).tolist()
+        # Штраф за аудиторію для кожної пари (заняття, аудиторія) не змінюється під час пошуку
+        self._room_cost = self._classroom_costs(enc)
+
+        self._slot_teacher = [0] * (n_slots * self._n_teachers)
+        self._slot_classroom = [0] * (n_slots * self._n_classrooms)
+        self._slot_group = [0] * (n_slots * self._n_groups)
+        self._slot_subgroup = [0] * (n_slots * self._n_subgroups)
+        self._slot_parent = [0] * (n_slots * self._n_groups)
+        self._load = [0] * self._n_teachers
+        self._members = [set() for _ in range(n_slots)]
+        # Заняття в кожній клітинці (вид ресурсу, слот × ресурс) — для перевірки сусідів після ходу
+        self._cell_lessons = {}
+        for i in range(self.n_lessons):
+            self._count(i, self.slot[i], self.teacher[i], self.classroom[i], 1)
+            self._members[self.slot[i]].add(i)
+            for cell in self._cells(i, self.slot[i], self.teacher[i], self.classroom[i])[0]:
+                self._cell_lessons.setdefault(cell, set()).add(i)
+        self.conflicts = IndexedSet(i for i in range(self.n_lessons) if self._in_conflict(i))
+
+        w = penalties
+        self._track_balance = bool(w.day_imbalance_excess or w.day_imbalance_count)
+        self._track_gaps = bool(w.teacher_gap)
+        self._first = [min(m) if m else self.n_lessons for m in self._members]
+        self._order = self._appearance_order()
+        self._refresh_all_ordered()
+        # Штрафи, незалежні від порядку слотів, рахуємо повною оцінкою один раз
+        unordered = penalties._replace(day_imbalance_excess=0, day_imbalance_count=0, teacher_gap=0)
+        self._base = get_evaluator(problem, unordered).evaluate_encoded(enc)
+
+    @property
+    def score(self):
+        """Поточне значення цільової функції."""
+        return self._base + self._ordered_score()
+
+    def assignment(self, lesson):
+        """Повертає (слот, викладач, аудиторія) заняття."""
+        return self.slot[lesson], self.teacher[lesson], self.classroom[lesson]
+
+    def snapshot(self):
+        """Компактний знімок призначень: масив int32 (слот, викладач, аудиторія) × заняття."""
+        return np.array((self.slot, self.teacher, self.classroom), dtype=np.int32)
+
+    def encoded(self, snapshot=None):
+        """Повертає поточний розклад (або знімок) як EncodedSchedule."""
+        slot, teacher, classroom = self.snapshot() if snapshot is None else snapshot
+        return self._enc._replace(
+            slot=slot.astype(np.int64),
+            teacher=teacher.astype(np.int64),
+            classroom=classroom.astype(np.int64),
+        )
+
+    def delta(self, lesson, slot, teacher, classroom):
+        """Точна зміна score при перепризначенні заняття (стан не змінюється)."""
+        previous = self.assignment(lesson)
+        change = self.apply(lesson, slot, teacher, classroom)
+        self.apply(lesson, *previous)
+        return change
+
+    def apply(self, lesson, slot, teacher, classroom):
+        """Перепризначає заняття на (слот, викладач, аудиторія) і повертає зміну score.
+
+        Відкат — повторний виклик apply зі старими значеннями з assignment().
+        """
+        old_slot, old_teacher, old_classroom = self.slot[lesson], self.teacher[lesson], self.classroom[lesson]
+        if old_slot == slot and old_teacher == teacher and old_classroom == classroom:
+            return 0
+        before_ordered = self._ordered_score()
+        delta = -self._unary(lesson, old_slot, old_teacher, old_classroom)
+        delta += self._count(lesson, old_slot, old_teacher, old_classroom, -1)
+        self.slot[lesson], self.teacher[lesson], self.classroom[lesson] = slot, teacher, classroom
+        delta += self._count(lesson, slot, teacher, classroom, 1)
+        delta += self._unary(lesson, slot, teacher, classroom)
+        self._base += delta
+        self._update_conflicts(lesson, (old_slot, old_teacher, old_classroom), (slot, teacher, classroom))
+
+        reordered = False
+        if slot != old_slot:
+            members = self._members[old_slot]
+            members.discard(lesson)
+            self._members[slot].add(lesson)
+            if self._first[old_slot] == lesson:
+                self._first[old_slot] = min(members) if members else self.n_lessons
+                reordered = True
+            if lesson < self._first[slot]:
+                self._first[slot] = lesson
+                reordered = True
+
+        if not (self._track_balance or self._track_gaps):
+            return delta
+        if reordered:
+            order = self._appearance_order()
+            if order != self._order:
+                self._order = order
+                self._refresh_all_ordered()
+                return delta + self._ordered_score() - before_ordered
+        if slot != old_slot and self.group[lesson] >= 0:
+            self._refresh_group(self.group[lesson])
+        if slot != old_slot or teacher != old_teacher:
+            if old_teacher >= 0:
+                self._refresh_teacher(old_teacher)
+            if teacher >= 0 and teacher != old_teacher:
+                self._refresh_teacher(teacher)
+        return delta + self._ordered_score() - before_ordered
+
+    def _cells(self, i, slot, teacher, classroom):
+        """Клітинки, які займає заняття, і клітинки занять, з якими воно може конфліктувати через групу."""
+        own, cross = [], []
+        if teacher >= 0:
+            own.append((0, slot * self._n_teachers + teacher))
+        if classroom >= 0:
+            own.append((1, slot * self._n_classrooms + classroom))
+        group = self.group[i]
+        if group >= 0:
+            key = slot * self._n_groups + group
+            own.append((2, key))
+            cross.append((4, key))
+        subgroup = self.subgroup[i]
+        if subgroup >= 0:
+            own.append((3, slot * self._n_subgroups + subgroup))
+            parent = self.parent[i]
+            if parent >= 0:
+                key = slot * self._n_groups + parent
+                own.append((4, key))
+                cross.append((2, key))
+        return own, cross
+
+    def _in_conflict(self, i):
+        """Чи має заняття жорсткий конфлікт за поточними лічильниками."""
+        slot, teacher, classroom = self.slot[i], self.teacher[i], self.classroom[i]
+        if teacher >= 0 and (self._slot_teacher[slot * self._n_teachers + teacher] > 1
+                             or not self._available[teacher * len(self._slot_day) + slot]):
+            return True
+        if classroom >= 0 and self._slot_classroom[slot * self._n_classrooms + classroom] > 1:
+            return True
+        group = self.group[i]
+        if group >= 0:
+            key = slot * self._n_groups + group
+            return self._slot_group[key] > 1 or self._slot_parent[key] > 0
+        subgroup = self.subgroup[i]
+        if subgroup >= 0:
+            if self._slot_subgroup[slot * self._n_subgroups + subgroup] > 1:
+                return True
+            parent = self.parent[i]
+            return parent >= 0 and self._slot_group[slot * self._n_groups + parent] > 0
+        return False
+
+    def _update_conflicts(self, lesson, old, new):
+        """Переносить заняття між клітинками і перевіряє лише заняття, що з ним їх ділять."""
+        old_own, old_cross = self._cells(lesson, *old)
+        new_own, new_cross = self._cells(lesson, *new)
+        cells = self._cell_lessons
+        for cell in old_own:
+            cells[cell].discard(lesson)
+        for cell in new_own:
+            if cell in cells:
+                cells[cell].add(lesson)
+            else:
+                cells[cell] = {lesson}
+        touched = {lesson}
+        for cell in chain(old_own, old_cross, new_own, new_cross):
+            if cell in cells:
+                touched.update(cells[cell])
+        for i in touched:
+            if self._in_conflict(i):
+                self.conflicts.add(i)
+            else:
+                self.conflicts.discard(i)
+
+    def _classroom_costs(self, enc):
+        """Матриця штрафів (заняття × аудиторія) за тип і місткість."""
+        w = self.penalties
+        if not w.classroom_mismatch:
+            return None
+        p = self.problem
+        room_type = p.classroom_type[None, :]
+        capacity = p.classroom_capacity[None, :]
+        students = enc.student_count[:, None]
+        lesson_type = enc.lesson_type[:, None]
+        bad_lecture = (lesson_type == LECTURE) & ((room_type != LECTURE) | (students > capacity))
+        bad_lab = (lesson_type == LAB) & ((room_type != LAB) | (2 * students > capacity))
+        return ((bad_lecture | bad_lab) * w.classroom_mismatch).tolist()
+
+    def _unary(self, i, slot, teacher, classroom):
+        """Штрафи, що залежать лише від самого заняття."""
+        w = self.penalties
+        cost = 0
+        if teacher >= 0 and not self._available[teacher * len(self._slot_day) + slot]:
+            cost += w.availability
+        if classroom >= 0 and self._room_cost is not None:
+            cost += self._room_cost[i][classroom]
+        if self._lecture[i] and self._afternoon[slot]:
+            cost += w.afternoon_lecture
+        return cost
+
+    def _count(self, i, slot, teacher, classroom, sign):
+        """Додає (sign=1) або прибирає (sign=-1) заняття з лічильників і повертає зміну штрафу."""
+        w = self.penalties
+        removing = sign < 0
+        delta = 0
+        if teacher >= 0:
+            # Пари з іншими заняттями викладача і перевищення max_load
+            key = slot * self._n_teachers + teacher
+            delta += sign * w.teacher_overlap * (self._slot_teacher[key] - removing)
+            over = self._load[teacher] + (not removing) - self._max_load[teacher]
+            if over > 0:
+                delta += sign * w.overload * over
+            self._slot_teacher[key] += sign
+            self._load[teacher] += sign
+        if classroom >= 0:
+            key = slot * self._n_classrooms + classroom
+            delta += sign * w.classroom_overlap * (self._slot_classroom[key] - removing)
+            self._slot_classroom[key] += sign
+        group = self.group[i]
+        if group >= 0:
+            key = slot * self._n_groups + group
+            if self._slot_group[key] - removing >= 1:
+                delta += sign * w.group_overlap
+            delta += sign * w.lecture_lab_overlap * self._slot_parent[key]
+            self._slot_group[key] += sign
+        subgroup = self.subgroup[i]
+        if subgroup >= 0:
+            key = slot * self._n_subgroups + subgroup
+            same = self._slot_subgroup[key] - removing
+            if same >= 1:
+                delta += sign * w.subgroup_overlap
+            parent = self.parent[i]
+            if parent >= 0:
+                parent_key = slot * self._n_groups + parent
+                delta += sign * w.lecture_lab_overlap * self._slot_group[parent_key]
+                siblings = self._slot_parent[parent_key] - removing - same
+                delta += sign * w.sibling_subgroups * siblings
+                self._slot_parent[parent_key] += sign
+            self._slot_subgroup[key] += sign
+        return delta
+
+    def _appearance_order(self):
+        """Зайняті слоти в порядку першої появи в розкладі."""
+        return sorted((s for s in range(len(self._members)) if self._members[s]), key=self._first.__getitem__)
+
+    def _ordered_score(self):
+        """Частина score, що залежить від порядку слотів."""
+        w = self.penalties
+        score = w.day_imbalance_count * self._heavy_count_total + w.teacher_gap * self._gaps_total
+        if w.day_imbalance_excess:
+            return score + w.day_imbalance_excess * self._heavy_excess_total / len(DAYS)
+        return score
+
+    def _refresh_all_ordered(self):
+        """Векторизовано перераховує кеш рівномірності і «вікон» для всіх груп і викладачів."""
+        p = self.problem
+        n_days = len(DAYS)
+        order = np.array(self._order, dtype=np.int64)
+        rows = np.arange(len(order))
+        days = p.slot_day[order]
+        self._heavy_count = [0] * p.n_groups
+        self._heavy_excess = [0] * p.n_groups
+        self._gaps = [0] * p.n_teachers
+        if self._track_balance and len(order):
+            columns = np.array(self._slot_group).reshape(p.n_slots, p.n_groups)[order]
+            increments = np.zeros((len(order), p.n_groups, n_days), dtype=np.int64)
+            increments[rows, :, days] = columns
+            heavy_count, heavy_excess = day_imbalance(increments)
+            self._heavy_count, self._heavy_excess = heavy_count.tolist(), heavy_excess.tolist()
+        if self._track_gaps and len(order):
+            columns = np.array(self._slot_teacher).reshape(p.n_slots, p.n_teachers)[order]
+            increments = np.zeros((len(order), p.n_teachers, n_days), dtype=np.int64)
+            increments[rows, :, days] = columns
+            self._gaps = teacher_gaps(increments, p.slot_period[order], p.n_slots).tolist()
+        self._heavy_count_total = sum(self._heavy_count)
+        self._heavy_excess_total = sum(self._heavy_excess)
+        self._gaps_total = sum(self._gaps)
+
+    def _refresh_group(self, group):
+        """Перераховує штраф за рівномірність однієї групи (те саме, що day_imbalance)."""
+        if not self._track_balance:
+            return
+        n_days = len(DAYS)
+        counts = [0] * n_days
+        total = heavy_count = heavy_excess = 0
+        for slot in self._order:
+            lessons = self._slot_group[slot * self._n_groups + group]
+            if lessons:
+                counts[self._slot_day[slot]] += lessons
+                total += lessons
+            for count in counts:
+                excess = n_days * count - total
+                if excess > n_days:
+                    heavy_count += count
+                    heavy_excess += excess
+        self._heavy_count_total += heavy_count - self._heavy_count[group]
+        self._heavy_excess_total += heavy_excess - self._heavy_excess[group]
+        self._heavy_count[group] = heavy_count
+        self._heavy_excess[group] = heavy_excess
+
+    def _refresh_teacher(self, teacher):
+        """Перераховує кількість «вікон» одного викладача (те саме, що teacher_gaps)."""
+        if not self._track_gaps:
+            return
+        n_days = len(DAYS)
+        counts = [0] * n_days
+        first = [0] * n_days
+        last = [0] * n_days
+        gaps = 0
+        for slot in self._order:
+            lessons = self._slot_teacher[slot * self._n_teachers + teacher]
+            if lessons:
+                day = self._slot_day[slot]
+                period = self._slot_period[slot]
+                if not counts[day]:
+                    first[day] = last[day] = period
+                else:
+                    first[day] = min(first[day], period)
+                    last[day] = max(last[day], period)
+                counts[day] += lessons
+            for day in range(n_days):
+                if counts[day] > 1 and last[day] - first[day] + 1 > counts[day]:
+                    gaps += 1
+        self._gaps_total += gaps - self._gaps[teacher]
+        self._gaps[teacher] = gaps
@@ -0,0 +1,246 @@
+import random
+import time
+import logging
+import numpy as np
+from database.queries import publish_schedule
+from optimization.algorithms.problem import load_problem
+from optimization.algorithms.fitness import get_evaluator, decode_schedule, ANNEALING_PENALTIES
+from optimization.algorithms.incremental import IncrementalEvaluator
+from optimization.algorithms.greedy import greedy_assignment
+from optimization.algorithms.tabu import generate_initial_assignment
+from optimization.algorithms.workers import pipe_workers, receive_all
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Найбільша кількість занять у кластері конфліктів
+CLUSTER_SIZE = 30
+# Скільки випадкових призначень пробується для заняття, яке не вдалося розмістити без конфліктів
+FALLBACK_CANDIDATES = 10
+
+class LargeNeighbourhoodSearch:
+    """Пошук великих околів: знімає з розкладу пов'язану частину занять і будує її заново.
+
+    Частина — усі заняття одного дня, одного викладача, однієї групи (разом з її підгрупами)
+    або кластер занять із жорсткими конфліктами. Зняті заняття розміщуються жадібним
+    конструктором DSatur навколо решти розкладу, кожне — у вільний слот з найменшою зміною
+    score; ті, яким не лишилося вільного місця, отримують найдешевше з кількох випадкових призначень. Новий розклад приймається, якщо
+    score не погіршився (рівні приймаються, щоб пошук не застрягав на плато), інакше відкочується.
+    """
+
+    def __init__(self, problem, assignment, rng=None, penalties=ANNEALING_PENALTIES):
+        self.problem = problem
+        self.rng = rng or random.Random()
+        self.evaluator = IncrementalEvaluator(problem, penalties, get_evaluator(problem, penalties).encode_assignment(assignment))
+        self.score = self.evaluator.score
+        self.iterations = 0
+        self.accepted = 0
+        evaluator = self.evaluator
+        # Група заняття; для лабораторних — батьківська група підгрупи
+        self.block = [
+            evaluator.group[i] if evaluator.group[i] >= 0
+            else evaluator.parent[i] if evaluator.parent[i] >= 0
+            else problem.n_groups + evaluator.subgroup[i]
+            for i in range(evaluator.n_lessons)
+        ]
+        self.slot_day = problem.slot_day.tolist()
+        self.neighbourhoods = [self.destroy_day, self.destroy_teacher, self.destroy_group, self.destroy_conflicts]
+
+    def _seed_lesson(self):
+        """Заняття, навколо якого руйнується розклад: переважно конфліктне."""
+        if self.evaluator.conflicts:
+            return self.evaluator.conflicts.choice(self.rng)
+        return self.rng.randrange(self.evaluator.n_lessons)
+
+    def destroy_day(self):
+        """Усі заняття одного дня."""
+        day = self.slot_day[self.evaluator.slot[self._seed_lesson()]]
+        return [i for i, slot in enumerate(self.evaluator.slot) if self.slot_day[slot] == day]
+
+    def destroy_teacher(self):
+        """Усі заняття одного викладача."""
+        teacher = self.evaluator.teacher[self._seed_lesson()]
+        return [i for i, t in enumerate(self.evaluator.teacher) if t == teacher]
+
+    def destroy_group(self):
+        """Усі заняття групи разом з лабораторними її підгруп."""
+        block = self.block[self._seed_lesson()]
+        return [i for i, b in enumerate(self.block) if b == block]
+
+    def destroy_conflicts(self):
+        """Кластер конфліктних занять: зв'язні через спільний слот і ресурс або спільну групу чи викладача."""
+        evaluator = self.evaluator
+        if not evaluator.conflicts:
+            return self.rng.choice(self.neighbourhoods[:-1])()
+        pending = list(evaluator.conflicts)
+        cluster = [evaluator.conflicts.choice(self.rng)]
+        pending.remove(cluster[0])
+        position = 0
+        while position < len(cluster) and len(cluster) < CLUSTER_SIZE:
+            i = cluster[position]
+            position += 1
+            related = [
+                j for j in pending
+                if self.block[j] == self.block[i] or evaluator.teacher[j] == evaluator.teacher[i]
+                or (evaluator.slot[j] == evaluator.slot[i] and evaluator.classroom[j] == evaluator.classroom[i])
+            ]
+            self.rng.shuffle(related)
+            for j in related[:CLUSTER_SIZE - len(cluster)]:
+                cluster.append(j)
+                pending.remove(j)
+        return cluster
+
+    def repair(self, removed):
+        """Розміщує зняті заняття заново; повертає зміну score і попередні призначення для відкату."""
+        evaluator = self.evaluator
+        previous = [(i, *evaluator.assignment(i)) for i in removed]
+        removed_set = set(removed)
+        fixed = [
+            (i, evaluator.slot[i], evaluator.teacher[i], evaluator.classroom[i])
+            for i in range(evaluator.n_lessons) if i not in removed_set
+        ]
+        delta = 0
+
+        # Кожне розміщення одразу застосовується, тож наступні оцінюються вже з його урахуванням
+        def choose(lesson_idx, candidates):
+            nonlocal delta
+            best = min(candidates, key=lambda candidate: evaluator.delta(lesson_idx, *candidate))
+            delta += evaluator.apply(lesson_idx, *best)
+            return best
+
+        placed = greedy_assignment(self.problem, self.rng, removed, fixed, choose)
+        for i in removed:
+            if placed[i] is None:
+                delta += self._place_cheapest(i)
+        return delta, previous
+
+    def _place_cheapest(self, lesson_idx):
+        """Залишає заняття на місці або переносить на найдешевше з FALLBACK_CANDIDATES випадкових призначень."""
+        problem, rng = self.problem, self.rng
+        best, best_delta = None, 0
+        for _ in range(FALLBACK_CANDIDATES):
+            candidate = (
+                rng.randrange(problem.n_slots),
+                int(rng.choice(problem.lesson_teachers[lesson_idx])),
+                int(rng.choice(problem.lesson_classrooms[lesson_idx])),
+            )
+            delta = self.evaluator.delta(lesson_idx, *candidate)
+            if delta < best_delta:
+                best, best_delta = candidate, delta
+        if best is None:
+            return 0
+        return self.evaluator.apply(lesson_idx, *best)
+
+    def step(self):
+        """Одна ітерація «зруйнувати й відновити»; повертає True, якщо score покращився."""
+        self.iterations += 1
+        removed = self.rng.choice(self.neighbourhoods)()
+        delta, previous = self.repair(removed)
+        if delta > 0:
+            for change in reversed(previous):
+                self.evaluator.apply(*change)
+            return False
+        self.accepted += 1
+        self.score += delta
+        return delta < 0
+
+    def run(self, time_budget=None, iterations=None):
+        """Виконує ітерації до вичерпання бюджету часу (секунд) чи кількості ітерацій або до score 0.
+
+        Потрібне хоча б одне обмеження: score 0 досяжний не завжди.
+        """
+        if not time_budget and iterations is None:
+            raise ValueError("Потрібен бюджет часу або кількість ітерацій")
+        deadline = time.perf_counter() + time_budget if time_budget else None
+        done = 0
+        while self.score > 0:
+            if iterations is not None and done >= iterations:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            done += 1
+            if self.step():
+                logger.debug(f"Ітерація {self.iterations}, Новий найкращий фітнес: {self.score}")
+        return self.score
+
+def run_lns(problem=None, time_budget=5, iterations=None, workers=1, sync_interval=5):
+    """Запускає пошук великих околів для оптимізації розкладу.
+
+    Пошук обмежується time_budget секунд (і/або iterations ітераціями); хоча б одне з
+    обмежень обов'язкове. Якщо workers > 1, пошуки з різними зерненнями працюють в окремих
+    процесах раундами по sync_interval секунд; після кожного раунду всі продовжують
+    з найкращого знайденого розкладу.
+    """
+    if not time_budget and iterations is None:
+        raise ValueError("Потрібен бюджет часу або кількість ітерацій")
+    logger.info(f"Запуск пошуку великих околів: процесів {workers}, бюджет часу {time_budget} с")
+    problem = problem or load_problem()
+    initial = generate_initial_assignment(problem)
+    started = time.perf_counter()
+
+    if workers <= 1:
+        search = LargeNeighbourhoodSearch(problem, initial)
+        logger.info(f"Початковий фітнес: {search.score}")
+        best_fitness = search.run(time_budget, iterations)
+        best_snapshot = search.evaluator.snapshot()
+        logger.info(f"Ітерацій: {search.iterations}, Прийнято: {search.accepted}")
+    else:
+        best_snapshot, best_fitness = _run_workers(problem, initial, workers, time_budget, iterations, sync_interval)
+    logger.info(f"Пошук тривав {time.perf_counter() - started:.1f} с")
+
+    evaluator = get_evaluator(problem, ANNEALING_PENALTIES)
+    best_schedule = decode_schedule(evaluator.encode_assignment(np.asarray(best_snapshot).T), problem)
+
+    # Збереження розкладу в базу
+    try:
+        params = dict(time_budget=time_budget, iterations=iterations, workers=workers, sync_interval=sync_interval)
+        publish_schedule(best_schedule, "lns", params, best_fitness, time.perf_counter() - started)
+        logger.info("Розклад збережено в базу даних")
+    except Exception as e:
+        logger.error(f"Помилка збереження розкладу: {e}")
+
+    logger.info(f"Оптимізація завершена. Конфлікти: {best_fitness}, Занять: {len(best_schedule)}")
+    return best_schedule
+
+def _run_workers(problem, initial, workers, time_budget, iterations, sync_interval):
+    """Паралельні пошуки, що синхронізуються на найкращому розкладі; повертає (знімок, фітнес)."""
+    rounds = max(1, round((time_budget or sync_interval) / sync_interval))
+    round_iterations = -(-iterations // (rounds * workers)) if iterations is not None else None
+    best_snapshot, best_fitness = None, None
+    worker_args = [(problem, initial, random.getrandbits(64)) for _ in range(workers)]
+    with pipe_workers(_run_worker, worker_args) as connections:
+        for round_idx in range(rounds):
+            round_budget = time_budget / rounds if time_budget else None
+            for connection in connections:
+                connection.send((best_snapshot, round_budget, round_iterations))
+            results = receive_all(connections)
+            best_snapshot, best_fitness, _ = min(results, key=lambda result: result[1])
+            logger.info(f"Раунд {round_idx + 1}/{rounds}, Найкращий фітнес: {best_fitness}, "
+                        f"Ітерацій: {sum(result[2] for result in results)}")
+            if best_fitness == 0:
+                break
+        for connection in connections:
+            connection.send(None)
+    return best_snapshot, best_fitness
+
+def _run_worker(problem, initial, seed, connection):
+    random.seed(seed)
+    search = LargeNeighbourhoodSearch(problem, initial, random.Random(seed))
+    while True:
+        command = connection.recv()
+        if command is None:
+            break
+        snapshot, time_budget, iterations = command
+        if snapshot is not None and not np.array_equal(snapshot, search.evaluator.snapshot()):
+            search = LargeNeighbourhoodSearch(problem, snapshot.T, search.rng)
+        started = search.iterations
+        search.run(time_budget, iterations)
+        connection.send((search.evaluator.snapshot(), search.score, search.iterations - started))
+    connection.close()
+
+if __name__ == "__main__":
+    try:
+        best_schedule = run_lns()
+        logger.info("Найкращий розклад")
+    except Exception as e:
+        logger.error(f"Помилка: {e}")
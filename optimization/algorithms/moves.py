@@ -0,0 +1,111 @@
+import random
+
+
+class Move:
+    """Хід локального пошуку: змінює розклад IncrementalEvaluator на місці і може бути скасований."""
+
+    def __init__(self):
+        self.previous = ()
+
+    def changes(self, evaluator):
+        """Повертає нові призначення (заняття, слот, викладач, аудиторія)."""
+        raise NotImplementedError
+
+    def apply(self, evaluator):
+        """Виконує хід і повертає зміну score."""
+        changes = self.changes(evaluator)
+        self.previous = tuple((lesson, *evaluator.assignment(lesson)) for lesson, *_ in changes)
+        return sum(evaluator.apply(*change) for change in changes)
+
+    def undo(self, evaluator):
+        """Скасовує останнє виконання ходу і повертає зміну score."""
+        return sum(evaluator.apply(*change) for change in reversed(self.previous))
+
+    def restore_snapshot(self, snapshot):
+        """Повертає у знімку стан до ходу (дешевше, ніж скасувати хід і зробити знімок)."""
+        for lesson, slot, teacher, classroom in self.previous:
+            snapshot[:, lesson] = slot, teacher, classroom
+        return snapshot
+
+
+class ChangeTeacher(Move):
+    """Призначає заняттю іншого викладача."""
+
+    def __init__(self, lesson, teacher):
+        super().__init__()
+        self.lesson, self.teacher = lesson, teacher
+
+    def changes(self, evaluator):
+        slot, _, classroom = evaluator.assignment(self.lesson)
+        return [(self.lesson, slot, self.teacher, classroom)]
+
+
+class ChangeRoom(Move):
+    """Переносить заняття в іншу аудиторію."""
+
+    def __init__(self, lesson, classroom):
+        super().__init__()
+        self.lesson, self.classroom = lesson, classroom
+
+    def changes(self, evaluator):
+        slot, teacher, _ = evaluator.assignment(self.lesson)
+        return [(self.lesson, slot, teacher, self.classroom)]
+
+
+class ChangeSlot(Move):
+    """Переносить заняття в інший часовий слот."""
+
+    def __init__(self, lesson, slot):
+        super().__init__()
+        self.lesson, self.slot = lesson, slot
+
+    def changes(self, evaluator):
+        _, teacher, classroom = evaluator.assignment(self.lesson)
+        return [(self.lesson, self.slot, teacher, classroom)]
+
+
+class SwapLessons(Move):
+    """Обмінює часові слоти двох занять."""
+
+    def __init__(self, first, second):
+        super().__init__()
+        self.first, self.second = first, second
+
+    def changes(self, evaluator):
+        first_slot, first_teacher, first_classroom = evaluator.assignment(self.first)
+        second_slot, second_teacher, second_classroom = evaluator.assignment(self.second)
+        return [
+            (self.first, second_slot, first_teacher, first_classroom),
+            (self.second, first_slot, second_teacher, second_classroom),
+        ]
+
+
+# Частка ходів для випадкового заняття; решта — для занять із жорсткими конфліктами
+RANDOM_FRACTION = 0.2
+
+
+def random_move(evaluator, problem, random_fraction=None):
+    """Випадковий хід: інший викладач, аудиторія чи слот заняття або обмін слотами двох занять.
+
+    Заняття вибирається переважно з evaluator.conflicts, з імовірністю random_fraction
+    (за замовчуванням RANDOM_FRACTION) — з усіх.
+    """
+    if random_fraction is None:
+        random_fraction = RANDOM_FRACTION
+    if evaluator.conflicts and random.random() >= random_fraction:
+        lesson_idx = evaluator.conflicts.choice()
+    else:
+        lesson_idx = random.randrange(evaluator.n_lessons)
+
+    change = random.choice(["teacher", "classroom", "time_slot", "swap"])
+    if change == "teacher":
+        teachers = problem.lesson_teachers[lesson_idx]
+        if len(teachers):
+            return ChangeTeacher(lesson_idx, int(random.choice(teachers)))
+    elif change == "classroom":
+        suitable_classrooms = problem.lesson_classrooms[lesson_idx]
+        if len(suitable_classrooms):
+            return ChangeRoom(lesson_idx, int(random.choice(suitable_classrooms)))
+    elif change == "swap":
+        return SwapLessons(lesson_idx, random.randrange(evaluator.n_lessons))
+    return ChangeSlot(lesson_idx, random.randrange(problem.n_slots))
@@ -0,0 +1,326 @@
+import json
+import logging
+from dataclasses import dataclass
+from functools import cached_property
+from typing import NamedTuple
+import numpy as np
+from sqlalchemy import select
+from database.queries import Session
+from database.models import (
+    LessonType, ClassroomType, Teacher, Classroom, Group, Subgroup, Discipline, teacher_disciplines,
+    DAYS, PERIODS, TIME_SLOTS
+)
+
+logger = logging.getLogger(__name__)
+
+# Цілочисельні коди типів занять і аудиторій
+LECTURE = 0
+LAB = 1
+LESSON_TYPE_CODES = {LessonType.LECTURE.value: LECTURE, LessonType.LAB.value: LAB}
+CLASSROOM_TYPE_CODES = {ClassroomType.LECTURE: LECTURE, ClassroomType.LAB: LAB}
+
+
+class Lesson(NamedTuple):
+    """Обов'язкове заняття: лекція групи або лабораторна підгрупи (індекси, -1 — відсутній)."""
+    lesson_type: str
+    group: int
+    subgroup: int
+    discipline: int
+    student_count: int
+
+
+class DomainTable(NamedTuple):
+    """Домени занять як вирівняна таблиця (заняття × найбільший домен) і розміри доменів."""
+    values: np.ndarray
+    sizes: np.ndarray
+
+    def sample(self, rng, size=None):
+        """Вибирає випадкове значення з домену кожного заняття (rng — numpy.random.Generator).
+
+        Якщо задано size, повертає size вибірок одразу: масив size × заняття.
+        """
+        shape = len(self.sizes) if size is None else (size, len(self.sizes))
+        picks = (rng.random(shape) * self.sizes).astype(np.int64)
+        return self.values[np.arange(len(self.sizes)), picks]
+
+
+def _domain_table(domains):
+    sizes = np.array([len(domain) for domain in domains], dtype=np.int64)
+    values = np.zeros((len(domains), max(sizes, default=0)), dtype=np.int64)
+    for i, domain in enumerate(domains):
+        values[i, :len(domain)] = domain
+    return DomainTable(values, sizes)
+
+
+def _frozen(values, dtype=np.int64):
+    array = np.asarray(values, dtype=dtype)
+    array.setflags(write=False)
+    return array
+
+
+def _suitable_classrooms(classroom_type, classroom_capacity, lesson_type, student_count):
+    return np.flatnonzero(
+        (classroom_type == LESSON_TYPE_CODES[lesson_type]) & (classroom_capacity >= student_count)
+    )
+
+
+@dataclass(frozen=True, eq=False)
+class ProblemInstance:
+    """Незмінний знімок даних задачі, завантажений один раз на запуск алгоритму.
+
+    Усі сутності пронумеровані щільними індексами 0..n-1; словники *_index
+    переводять id з бази в індекс, масиви *_ids — навпаки.
+    """
+    time_slots: tuple
+    slot_index: dict
+    slot_day: np.ndarray
+    slot_period: np.ndarray
+
+    teacher_ids: np.ndarray
+    teacher_index: dict
+    teacher_names: tuple
+    teacher_max_load: np.ndarray
+    teacher_available: np.ndarray
+    teacher_slot_masks: tuple
+
+    classroom_ids: np.ndarray
+    classroom_index: dict
+    classroom_numbers: tuple
+    classroom_capacity: np.ndarray
+    classroom_type: np.ndarray
+
+    group_ids: np.ndarray
+    group_index: dict
+    group_names: tuple
+    group_student_count: np.ndarray
+
+    subgroup_ids: np.ndarray
+    subgroup_index: dict
+    subgroup_names: tuple
+    subgroup_student_count: np.ndarray
+    subgroup_group: np.ndarray
+
+    discipline_ids: np.ndarray
+    discipline_index: dict
+    discipline_names: tuple
+    discipline_teachers: tuple
+
+    lessons: tuple
+    lesson_teachers: tuple
+    lesson_classrooms: tuple
+
+    @property
+    def n_slots(self):
+        return len(self.time_slots)
+
+    @property
+    def n_teachers(self):
+        return len(self.teacher_ids)
+
+    @property
+    def n_classrooms(self):
+        return len(self.classroom_ids)
+
+    @property
+    def n_groups(self):
+        return len(self.group_ids)
+
+    @property
+    def n_subgroups(self):
+        return len(self.subgroup_ids)
+
+    @property
+    def n_disciplines(self):
+        return len(self.discipline_ids)
+
+    @cached_property
+    def lesson_slot_domain(self):
+        """Бажані слоти кожного заняття (ранкові для лекцій, післяобідні для лабораторних)."""
+        return _domain_table([self.preferred_slots(lesson.lesson_type) for lesson in self.lessons])
+
+    @cached_property
+    def lesson_teacher_domain(self):
+        return _domain_table(self.lesson_teachers)
+
+    @cached_property
+    def lesson_classroom_domain(self):
+        return _domain_table(self.lesson_classrooms)
+
+    def group_subgroups(self, group):
+        """Повертає індекси підгруп групи."""
+        return np.flatnonzero(self.subgroup_group == group)
+
+    def subgroup_parent_id(self, subgroup_id):
+        """Повертає id групи, до якої належить підгрупа, або None."""
+        idx = self.subgroup_index.get(subgroup_id)
+        if idx is None:
+            return None
+        return int(self.group_ids[self.subgroup_group[idx]])
+
+    def qualified_teachers(self, discipline_id):
+        """Повертає індекси викладачів дисципліни за її id з бази."""
+        idx = self.discipline_index.get(discipline_id)
+        return self.discipline_teachers[idx] if idx is not None else np.empty(0, dtype=np.int64)
+
+    def suitable_classrooms(self, lesson_type, student_count):
+        """Повертає індекси аудиторій потрібного типу з достатньою місткістю."""
+        return _suitable_classrooms(self.classroom_type, self.classroom_capacity, lesson_type, student_count)
+
+    def preferred_slots(self, lesson_type):
+        """Повертає індекси слотів: ранкові для лекцій, післяобідні для лабораторних."""
+        if lesson_type == LessonType.LECTURE.value:
+            return np.flatnonzero(self.slot_period < 2)
+        return np.flatnonzero(self.slot_period >= 2)
+
+    def is_available(self, teacher, slot):
+        """Перевіряє доступність викладача (індекс) у часовому слоті (індекс)."""
+        return bool(self.teacher_slot_masks[teacher] >> slot & 1)
+
+    def available_teachers(self, slot):
+        """Повертає булеву маску викладачів, доступних у часовому слоті."""
+        return self.teacher_available[:, slot]
+
+    def make_slot(self, lesson, slot, teacher, classroom):
+        """Перетворює заняття з індексами на словник у форматі розкладу."""
+        group_id = int(self.group_ids[lesson.group]) if lesson.group >= 0 else None
+        subgroup_id = int(self.subgroup_ids[lesson.subgroup]) if lesson.subgroup >= 0 else None
+        return {
+            "group_id": group_id,
+            "subgroup_id": subgroup_id,
+            "teacher_id": int(self.teacher_ids[teacher]),
+            "classroom_id": int(self.classroom_ids[classroom]),
+            "discipline_id": int(self.discipline_ids[lesson.discipline]),
+            "lesson_type": lesson.lesson_type,
+            "time_slot": self.time_slots[slot],
+            "group_student_count": lesson.student_count if group_id else 0,
+            "subgroup_student_count": lesson.student_count if subgroup_id else 0,
+        }
+
+    def slot_owner_name(self, slot):
+        """Повертає назву групи або підгрупи заняття для логування."""
+        if slot.get("group_id"):
+            return self.group_names[self.group_index[slot["group_id"]]]
+        if slot.get("subgroup_id"):
+            return self.subgroup_names[self.subgroup_index[slot["subgroup_id"]]]
+        return "-"
+
+
+def _compile_availability(availability):
+    """Перетворює JSON доступності викладача на булевий рядок по канонічній сітці слотів."""
+    days = json.loads(availability) if availability else {}
+    return [period in (days.get(day) or []) for day in DAYS for period in PERIODS]
+
+
+def _build_lessons(groups, subgroup_group, subgroup_student_count, n_disciplines):
+    """Формує перелік обов'язкових занять: лекції груп, потім лабораторні підгруп."""
+    lessons = []
+    for g, group in enumerate(groups):
+        for d in range(n_disciplines):
+            lessons.append(Lesson(LessonType.LECTURE.value, g, -1, d, group.student_count))
+
+    for g, group in enumerate(groups):
+        subgroups = [s for s in range(len(subgroup_group)) if subgroup_group[s] == g]
+        if len(subgroups) < 2:
+            logger.warning(f"Група {group.name} має менше 2 підгруп!")
+            continue
+        for s in subgroups:
+            for d in range(n_disciplines):
+                lessons.append(Lesson(LessonType.LAB.value, -1, s, d, int(subgroup_student_count[s])))
+    return tuple(lessons)
+
+
+def load_problem():
+    """Завантажує дані з бази кількома масовими запитами і будує ProblemInstance."""
+    logger.info("Завантаження даних із бази...")
+    session = Session()
+    try:
+        groups = session.query(Group).order_by(Group.id).all()
+        subgroups = session.query(Subgroup).order_by(Subgroup.id).all()
+        teachers = session.query(Teacher).order_by(Teacher.id).all()
+        classrooms = session.query(Classroom).order_by(Classroom.id).all()
+        disciplines = session.query(Discipline).order_by(Discipline.id).all()
+        links = session.execute(
+            select(teacher_disciplines.c.discipline_id, teacher_disciplines.c.teacher_id)
+        ).all()
+    finally:
+        session.close()
+
+    logger.info(
+        f"Знайдено: груп={len(groups)}, підгруп={len(subgroups)}, викладачів={len(teachers)}, "
+        f"аудиторій={len(classrooms)}, дисциплін={len(disciplines)}"
+    )
+
+    if not all([groups, subgroups, teachers, classrooms, disciplines]):
+        raise ValueError("Дані в базі неповні. Запустіть test_db.py.")
+
+    teacher_index = {t.id: i for i, t in enumerate(teachers)}
+    classroom_index = {c.id: i for i, c in enumerate(classrooms)}
+    group_index = {g.id: i for i, g in enumerate(groups)}
+    subgroup_index = {s.id: i for i, s in enumerate(subgroups)}
+    discipline_index = {d.id: i for i, d in enumerate(disciplines)}
+
+    qualified = [[] for _ in disciplines]
+    for discipline_id, teacher_id in links:
+        if discipline_id in discipline_index and teacher_id in teacher_index:
+            qualified[discipline_index[discipline_id]].append(teacher_index[teacher_id])
+    discipline_teachers = tuple(_frozen(sorted(t)) for t in qualified)
+
+    classroom_capacity = _frozen([c.capacity for c in classrooms])
+    classroom_type = _frozen([CLASSROOM_TYPE_CODES[ClassroomType(c.type)] for c in classrooms])
+    subgroup_group = _frozen([group_index.get(s.group_id, -1) for s in subgroups])
+    subgroup_student_count = _frozen([s.student_count for s in subgroups])
+
+    # Доступність розбирається один раз: матриця викладачі × слоти і бітова маска слотів для кожного викладача
+    teacher_available = _frozen([_compile_availability(t.availability) for t in teachers], dtype=bool)
+    teacher_slot_masks = tuple(sum(1 << int(s) for s in np.flatnonzero(row)) for row in teacher_available)
+
+    lessons = _build_lessons(groups, subgroup_group, subgroup_student_count, len(disciplines))
+
+    # Домени занять: кваліфіковані викладачі та аудиторії потрібного типу й місткості
+    all_teachers = _frozen(range(len(teachers)))
+    all_classrooms = _frozen(range(len(classrooms)))
+    lesson_teachers = tuple(
+        discipline_teachers[lesson.discipline] if len(discipline_teachers[lesson.discipline]) else all_teachers
+        for lesson in lessons
+    )
+    rooms_cache = {}
+    for lesson in lessons:
+        key = (lesson.lesson_type, lesson.student_count)
+        if key not in rooms_cache:
+            suitable = _suitable_classrooms(classroom_type, classroom_capacity, *key)
+            rooms_cache[key] = _frozen(suitable) if len(suitable) else all_classrooms
+    lesson_classrooms = tuple(rooms_cache[(lesson.lesson_type, lesson.student_count)] for lesson in lessons)
+
+    return ProblemInstance(
+        time_slots=TIME_SLOTS,
+        slot_index={ts: i for i, ts in enumerate(TIME_SLOTS)},
+        slot_day=_frozen([i // len(PERIODS) for i in range(len(TIME_SLOTS))]),
+        slot_period=_frozen([i % len(PERIODS) for i in range(len(TIME_SLOTS))]),
+        teacher_ids=_frozen([t.id for t in teachers]),
+        teacher_index=teacher_index,
+        teacher_names=tuple(t.name for t in teachers),
+        teacher_max_load=_frozen([t.max_load for t in teachers]),
+        teacher_available=teacher_available,
+        teacher_slot_masks=teacher_slot_masks,
+        classroom_ids=_frozen([c.id for c in classrooms]),
+        classroom_index=classroom_index,
+        classroom_numbers=tuple(c.number for c in classrooms),
+        classroom_capacity=classroom_capacity,
+        classroom_type=classroom_type,
+        group_ids=_frozen([g.id for g in groups]),
+        group_index=group_index,
+        group_names=tuple(g.name for g in groups),
+        group_student_count=_frozen([g.student_count for g in groups]),
+        subgroup_ids=_frozen([s.id for s in subgroups]),
+        subgroup_index=subgroup_index,
+        subgroup_names=tuple(s.name for s in subgroups),
+        subgroup_student_count=subgroup_student_count,
+        subgroup_group=subgroup_group,
+        discipline_ids=_frozen([d.id for d in disciplines]),
+        discipline_index=discipline_index,
+        discipline_names=tuple(d.name for d in disciplines),
+        discipline_teachers=discipline_teachers,
+        lessons=lessons,
+        lesson_teachers=lesson_teachers,
+        lesson_classrooms=lesson_classrooms,
+    )
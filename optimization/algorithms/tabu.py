@@ -0,0 +1,126 @@
+import random
+import time
+import logging
+import numpy as np
+from database.queries import publish_schedule
+from optimization.algorithms.problem import load_problem
+from optimization.algorithms.fitness import get_evaluator, decode_schedule, ANNEALING_PENALTIES
+from optimization.algorithms.incremental import IncrementalEvaluator
+from optimization.algorithms.greedy import greedy_assignment
+from optimization.algorithms.moves import random_move
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def generate_initial_assignment(problem):
+    """Початковий розклад: жадібний без конфліктів, нерозміщені заняття — випадково."""
+    assignment = []
+    for lesson_idx, placed in enumerate(greedy_assignment(problem)):
+        if placed is None:
+            placed = (
+                random.randrange(problem.n_slots),
+                int(random.choice(problem.lesson_teachers[lesson_idx])),
+                int(random.choice(problem.lesson_classrooms[lesson_idx])),
+            )
+        assignment.append(placed)
+    return np.array(assignment, dtype=np.int64).reshape(len(assignment), 3)
+
+def is_tabu(tabu, changes, iteration):
+    """Хід табуйований, якщо повертає заняття до призначення, з якого його нещодавно перенесли."""
+    return any(tabu.get(change, -1) > iteration for change in changes)
+
+def run_tabu_search(problem=None, iterations=2000, candidates=50, tenure=20, stagnation_limit=500, time_budget=None):
+    """Запускає табу-пошук для оптимізації розкладу.
+
+    На кожній ітерації оцінюється candidates випадкових ходів (інкрементно) і виконується
+    найкращий не табуйований; табуйований хід дозволяється, якщо дає новий найкращий
+    розклад (критерій аспірації). Повернення заняття до попереднього призначення
+    заборонене на tenure ітерацій. Якщо задано time_budget (секунд), пошук обмежується
+    часом, а не кількістю ітерацій.
+    """
+    logger.info("Запуск табу-пошуку...")
+    problem = problem or load_problem()
+    started = time.perf_counter()
+    initial = get_evaluator(problem, ANNEALING_PENALTIES).encode_assignment(generate_initial_assignment(problem))
+    evaluator = IncrementalEvaluator(problem, ANNEALING_PENALTIES, initial)
+    current_fitness = evaluator.score
+    best_fitness = current_fitness
+    # Найкращий розклад зберігається знімком лише тоді, коли пошук з нього йде
+    best_snapshot = None
+    at_best = True
+    logger.info(f"Початковий фітнес: {current_fitness}")
+
+    tabu = {}
+    stagnation_count = 0
+    deadline = time.time() + time_budget if time_budget else None
+    iteration = 0
+    while iteration < iterations or deadline is not None:
+        if deadline is not None and time.time() >= deadline:
+            break
+
+        # Оцінюємо пакет кандидатів і вибираємо найкращий допустимий
+        best_move, best_delta = None, None
+        for _ in range(candidates):
+            move = random_move(evaluator, problem)
+            changes = move.changes(evaluator)
+            delta = move.apply(evaluator)
+            move.undo(evaluator)
+            if is_tabu(tabu, changes, iteration) and current_fitness + delta >= best_fitness:
+                continue
+            if best_delta is None or delta < best_delta:
+                best_move, best_delta = move, delta
+        if best_move is None:
+            iteration += 1
+            continue
+
+        best_move.apply(evaluator)
+        current_fitness += best_delta
+        for change in best_move.previous:
+            tabu[change] = iteration + tenure + random.randrange(tenure // 2 + 1)
+
+        if current_fitness < best_fitness:
+            best_fitness = current_fitness
+            at_best = True
+            stagnation_count = 0
+            logger.info(f"Ітерація {iteration}, Новий найкращий фітнес: {best_fitness}, "
+                        f"Конфліктних занять: {len(evaluator.conflicts)}")
+        else:
+            if at_best:
+                best_snapshot = best_move.restore_snapshot(evaluator.snapshot())
+                at_best = False
+            stagnation_count += 1
+
+        if best_fitness == 0:
+            break
+        if stagnation_count > stagnation_limit:
+            logger.info(f"Стагнація після {iteration} ітерацій")
+            break
+
+        iteration += 1
+        if iteration % 500 == 0:
+            # Прострочені табу-записи більше не потрібні
+            tabu = {change: expiry for change, expiry in tabu.items() if expiry > iteration}
+            logger.info(f"Ітерація {iteration}, Найкращий фітнес: {best_fitness}")
+
+    if at_best:
+        best_snapshot = evaluator.snapshot()
+    best_schedule = decode_schedule(evaluator.encoded(best_snapshot), problem)
+
+    # Збереження розкладу в базу
+    try:
+        params = dict(iterations=iterations, candidates=candidates, tenure=tenure,
+                      stagnation_limit=stagnation_limit, time_budget=time_budget)
+        publish_schedule(best_schedule, "tabu", params, best_fitness, time.perf_counter() - started)
+        logger.info("Розклад збережено в базу даних")
+    except Exception as e:
+        logger.error(f"Помилка збереження розкладу: {e}")
+
+    logger.info(f"Оптимізація завершена. Конфлікти: {best_fitness}, Занять: {len(best_schedule)}")
+    return best_schedule
+
+if __name__ == "__main__":
+    try:
+        best_schedule = run_tabu_search()
+        logger.info("Найкращий розклад")
+    except Exception as e:
+        logger.error(f"Помилка: {e}")
@@ -0,0 +1,63 @@
+import multiprocessing
+from contextlib import contextmanager
+from optimization.algorithms.fitness import get_evaluator
+
+# Дані задачі й оцінювач процесу пулу; створюються один раз при старті пулу (initializer=init_pool_worker)
+_pool_problem = None
+_pool_evaluator = None
+
+
+def init_pool_worker(problem, penalties):
+    """Ініціалізатор multiprocessing.Pool: дані задачі й оцінювач з вагами penalties створюються в процесі один раз."""
+    global _pool_problem, _pool_evaluator
+    _pool_problem = problem
+    _pool_evaluator = get_evaluator(problem, penalties)
+
+
+def pool_problem():
+    """Дані задачі поточного процесу пулу."""
+    return _pool_problem
+
+
+def pool_evaluator():
+    """Оцінювач поточного процесу пулу."""
+    return _pool_evaluator
+
+
+@contextmanager
+def pipe_workers(target, worker_args):
+    """Запускає по процесу target(*args, connection) на кожен набір аргументів і повертає кінці Pipe батька.
+
+    Процес, що завершився аварійно, дає EOF (receive_all перетворює його на RuntimeError).
+    При будь-якій помилці всередині блоку живі процеси примусово зупиняються: вони чекають
+    на команду, якої вже не буде. Наприкінці з'єднання закриваються, а процеси очікуються.
+    """
+    connections, processes = [], []
+    try:
+        for args in worker_args:
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=target, args=(*args, child))
+            process.start()
+            # Копія кінця процесу в батьківському закривається, щоб смерть процесу давала EOF
+            child.close()
+            connections.append(parent)
+            processes.append(process)
+        yield connections
+    except BaseException:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        raise
+    finally:
+        for connection in connections:
+            connection.close()
+        for process in processes:
+            process.join()
+
+
+def receive_all(connections):
+    """Відповіді всіх процесів; RuntimeError, якщо котрийсь із них завершився аварійно."""
+    try:
+        return [connection.recv() for connection in connections]
+    except EOFError:
+        raise RuntimeError("Робочий процес завершився аварійно") from None